@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import math
+import time
+import tempfile
+import argparse
+import pdfplumber
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+import process_pdfs
+import synthetic_pdfs
+
+# Benchmark and golden-output regression check for process_pdf.
+#
+# Golden check: every output/<name>.json is compared with process_pdf on
+# input/<name>.pdf. Goldens without an input PDF are reported as skipped.
+# Benchmark: the sample PDFs and a generated synthetic corpus (many pages,
+# mixed font sizes, English/French/Korean/Japanese) are timed one document
+# at a time. Exits with status 1 when any golden output no longer matches.
+
+def percentile(values, q):
+    # Nearest-rank percentile
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+def peak_rss_mb():
+    # Peak of the whole benchmark process so far, not of one suite
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def page_count(path):
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+def check_golden(input_dir, golden_dir, use_bookmarks=True):
+    results = []
+    for filename in sorted(f for f in os.listdir(golden_dir) if f.endswith(".json")):
+        pdf_path = os.path.join(input_dir, os.path.splitext(filename)[0] + ".pdf")
+        if not os.path.isfile(pdf_path):
+            results.append({"document": filename, "status": "skipped", "reason": "input PDF not found"})
+            continue
+        with open(os.path.join(golden_dir, filename), "r", encoding="utf-8") as f:
+            golden = json.load(f)
+        output = process_pdfs.process_pdf(pdf_path, use_bookmarks=use_bookmarks)
+        status = "ok" if output == golden else "mismatch"
+        results.append({"document": filename, "status": status})
+    return results
+
+def run_suite(pdf_paths, fast=True, use_bookmarks=True):
+    latencies = []
+    pages = 0
+    for path in pdf_paths:
+        pages += page_count(path)
+        start = time.perf_counter()
+        process_pdfs.process_pdf(path, fast=fast, use_bookmarks=use_bookmarks)
+        latencies.append(time.perf_counter() - start)
+    total = sum(latencies)
+    return {
+        "documents": len(pdf_paths),
+        "pages": pages,
+        "seconds": round(total, 3),
+        "docs_per_second": round(len(pdf_paths) / total, 3) if total else None,
+        "pages_per_second": round(pages / total, 2) if total else None,
+        "latency_p50_seconds": round(percentile(latencies, 0.50), 3) if latencies else None,
+        "latency_p99_seconds": round(percentile(latencies, 0.99), 3) if latencies else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark process_pdf and check the golden outputs.")
+    parser.add_argument("--input-dir", default="input")
+    parser.add_argument("--golden-dir", default="output")
+    parser.add_argument("--synthetic-pages", type=int, default=100,
+                        help="pages per synthetic PDF; 0 skips the synthetic suite")
+    parser.add_argument("--synthetic-languages", default=",".join(synthetic_pdfs.WORDS))
+    parser.add_argument("--synthetic-dir", help="keep the synthetic PDFs here instead of a temporary folder")
+    parser.add_argument("--exact-glyphs", action="store_true")
+    parser.add_argument("--no-bookmarks", action="store_true")
+    parser.add_argument("--skip-golden", action="store_true")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    use_bookmarks = not args.no_bookmarks
+    results = {}
+
+    if not args.skip_golden:
+        # The goldens were produced with the default settings
+        results["golden"] = check_golden(args.input_dir, args.golden_dir)
+
+    sample_paths = sorted(
+        os.path.join(args.input_dir, f) for f in os.listdir(args.input_dir) if f.lower().endswith(".pdf")
+    )
+    results["samples"] = run_suite(sample_paths, not args.exact_glyphs, use_bookmarks)
+
+    if args.synthetic_pages > 0:
+        languages = [lang.strip() for lang in args.synthetic_languages.split(",") if lang.strip()]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            synthetic_paths = synthetic_pdfs.generate_corpus(args.synthetic_dir or tmp_dir, args.synthetic_pages, languages)
+            results["synthetic"] = run_suite(synthetic_paths, not args.exact_glyphs, use_bookmarks)
+
+    print(json.dumps(results, indent=4, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+
+    mismatches = [r["document"] for r in results.get("golden", []) if r["status"] == "mismatch"]
+    if mismatches:
+        print(f"Golden output mismatch: {', '.join(mismatches)}", file=sys.stderr)
+        exit(1)
@@ -0,0 +1,107 @@
+import os
+import json
+
+# A document model is the result of one parse of a PDF, stored as JSON so
+# the outline stage (process_pdfs.py) and the persona ranking stage
+# (challenge_1b) can share it instead of parsing the file twice:
+#
+#   {
+#     "version": 1,
+#     "source": "file.pdf",
+#     "digest": "<sha256 of the PDF>",
+#     "params": "<fingerprint of the extraction settings>",
+#     "title": "...",
+#     "pages": [{"page_number", "width", "height", "body_size",
+#                "lines": [{"text", "size", "top", "bottom"}]}],
+#     "headings": [{"level", "text", "page", "line"}],
+#     "sections": [{"title", "level", "page", "text"}]
+#   }
+#
+# Line texts keep the spaces between words. Headings are the outline entries
+# in output order; "line" is the index of the heading's line on its page, or
+# null when a bookmark could not be matched to a line. Each section runs from
+# one heading to the next; text before the first heading forms a section
+# without a title. "params" is outline_cache.params_fingerprint of
+# process_pdfs.extraction_params, so process_pdfs does not reuse a model
+# built with other settings (for example without bookmarks). challenge_1b
+# accepts a model of any settings, as long as "params" is a fingerprint, and
+# keys its block store on the model's own hash, so a model rewritten with
+# other settings replaces the sections built from the previous one.
+DOCUMENT_MODEL_VERSION = 1
+DOCUMENT_MODEL_SUFFIX = ".document.json"
+
+# A vertical gap larger than this many line heights starts a new paragraph
+# (a blank line in the section text).
+PARAGRAPH_GAP_FACTOR = 0.8
+
+def document_path_for(document_dir, pdf_name):
+    return os.path.join(document_dir, os.path.splitext(pdf_name)[0] + DOCUMENT_MODEL_SUFFIX)
+
+def _section(title, level, page):
+    return {"title": title, "level": level, "page": page, "parts": []}
+
+def build_sections(pages, headings):
+    starts = {}
+    for heading in headings:
+        starts.setdefault((heading["page"], heading["line"]), []).append(heading)
+
+    sections = []
+    current = None
+    for page in pages:
+        page_number = page["page_number"]
+        previous = None
+        # Bookmarks without a matching line open their section at the top of the page.
+        for line_index, line in [(None, None)] + list(enumerate(page["lines"])):
+            for heading in starts.get((page_number, line_index), []):
+                title = line["text"] if line is not None else heading["text"]
+                current = _section(title, heading["level"], page_number)
+                sections.append(current)
+                previous = None
+            if line is None:
+                continue
+            if current is None:
+                current = _section(None, None, page_number)
+                sections.append(current)
+
+            if current["parts"]:
+                height = previous["bottom"] - previous["top"] if previous else 0
+                new_paragraph = previous is None or line["top"] - previous["bottom"] > PARAGRAPH_GAP_FACTOR * height
+                current["parts"].append("\n\n" if new_paragraph else "\n")
+            current["parts"].append(line["text"])
+            previous = line
+
+    for section in sections:
+        section["text"] = "".join(section.pop("parts"))
+    return sections
+
+def outline_from_document(document):
+    return {
+        "title": document["title"],
+        "outline": [
+            {"level": h["level"], "text": h["text"], "page": h["page"]}
+            for h in document["headings"]
+        ]
+    }
+
+def save_document(document, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def load_document(path, digest=None, params=None):
+    """Returns the model stored at path, or None if it is missing, from
+    another model version, (when digest is given) of another PDF or (when
+    params is given) built with other extraction settings."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if document.get("version") != DOCUMENT_MODEL_VERSION:
+        return None
+    if digest is not None and document.get("digest") != digest:
+        return None
+    if params is not None and document.get("params") != params:
+        return None
+    return document
@@ -0,0 +1,199 @@
+import os
+import json
+import shutil
+import hashlib
+from collections import OrderedDict
+
+# Outlines are stored as <cache_dir>/<params fingerprint>/<content hash>.json.
+# Changing any extraction parameter changes the fingerprint, so stale entries
+# are never served. Entries of other settings stay until LRU eviction ages
+# them out, unless they were written by another version of the heuristics
+# (see invalidate_stale()). Each fingerprint directory records its
+# parameters in PARAMS_FILE for that check.
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+PARAMS_FILE = "params.json"
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def params_fingerprint(params):
+    encoded = json.dumps(params, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+class OutlineCache:
+    """
+    On-disk cache of outline results keyed by PDF content hash and a
+    fingerprint of the extraction parameters. Least recently used entries
+    are evicted once the cache grows beyond max_bytes.
+
+    The directory is scanned once, when the cache is opened; after that the
+    total size and the LRU order are kept in memory and updated on every
+    get and put, so a write never walks the cache. Entries written by another
+    process sharing the directory are only seen by the next open.
+    """
+
+    def __init__(self, cache_dir, params, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.params = params
+        self.fingerprint = params_fingerprint(params)
+        self.entry_dir = os.path.join(cache_dir, self.fingerprint)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.entry_dir, exist_ok=True)
+        params_path = os.path.join(self.entry_dir, PARAMS_FILE)
+        if not os.path.exists(params_path):
+            with open(params_path, "w", encoding="utf-8") as f:
+                json.dump(params, f, sort_keys=True)
+        # path -> size, least recently used first
+        self._lru = OrderedDict()
+        self._total = 0
+        for _, size, path in sorted(self._scan()):
+            self._lru[path] = size
+            self._total += size
+
+    def _entry_path(self, digest):
+        return os.path.join(self.entry_dir, f"{digest}.json")
+
+    def _scan(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json") or name == PARAMS_FILE:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def get(self, digest):
+        entry_path = self._entry_path(digest)
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            self._forget(entry_path)
+            return None
+        # Touch the entry so eviction, here and in the next process to open
+        # the cache, treats it as recently used. Another process may have
+        # evicted it since it was read; the result is still good.
+        try:
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+        if entry_path in self._lru:
+            self._lru.move_to_end(entry_path)
+        else:
+            self._add(entry_path)
+        self.hits += 1
+        return result
+
+    def put(self, digest, result):
+        entry_path = self._entry_path(digest)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            self._discard(tmp_path)
+            raise
+        self._add(entry_path)
+        self.evict()
+
+    def put_file(self, digest, outline_path):
+        entry_path = self._entry_path(digest)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        try:
+            shutil.copyfile(outline_path, tmp_path)
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            self._discard(tmp_path)
+            raise
+        self._add(entry_path)
+        self.evict()
+
+    def _add(self, path):
+        self._forget(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        self._lru[path] = size
+        self._total += size
+
+    def _forget(self, path):
+        size = self._lru.pop(path, None)
+        if size is not None:
+            self._total -= size
+
+    @staticmethod
+    def _discard(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        removed = 0
+        for path in list(self._lru):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            self._forget(path)
+            removed += 1
+        return removed
+
+    def invalidate_stale(self, version_key="heuristics_version"):
+        """
+        Removes the entries of every fingerprint whose parameters were
+        written by another version (params[version_key]) of the extraction
+        code, or recorded no parameters at all. Entries of other settings of
+        the current version are kept.
+        """
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name == self.fingerprint:
+                continue
+            stale_dir = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(stale_dir):
+                continue
+            try:
+                with open(os.path.join(stale_dir, PARAMS_FILE), "r", encoding="utf-8") as f:
+                    version = json.load(f).get(version_key)
+            except (OSError, ValueError, AttributeError):
+                version = None
+            if version is not None and version == self.params.get(version_key):
+                continue
+            for entry in os.listdir(stale_dir):
+                path = os.path.join(stale_dir, entry)
+                self._discard(path)
+                self._forget(path)
+                if entry != PARAMS_FILE:
+                    removed += 1
+            try:
+                os.rmdir(stale_dir)
+            except OSError:
+                pass
+        return removed
+
+    def clear(self):
+        removed = 0
+        for _, _, path in list(self._scan()):
+            self._discard(path)
+            removed += 1
+        self._lru.clear()
+        self._total = 0
+        return removed
@@ -0,0 +1,352 @@
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import argparse
+import threading
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import process_pdfs
+from outline_cache import DEFAULT_MAX_BYTES, OutlineCache, file_digest
+
+# Resident alternative to the one-shot batch entrypoint: worker processes
+# stay warm between files, the input directory is polled for new or changed
+# PDFs and jobs can also be pushed over a small localhost HTTP API.
+POLL_INTERVAL = 0.25
+LATENCY_WINDOW = 1000
+
+def _init_worker():
+    # The parent handles Ctrl+C and shuts the pool down itself.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def process_job(pdf_path, output_path, fast=True, timeout=None, use_bookmarks=True):
+    with process_pdfs.time_limit(timeout):
+        result = process_pdfs.process_pdf(pdf_path, fast=fast, use_bookmarks=use_bookmarks)
+    process_pdfs.write_outline(result, output_path)
+    return result
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+class OutlineService:
+    """
+    Keeps a warm worker pool and turns every new or changed PDF into
+    <output_dir>/<name>.json. Files whose content hash matches the last run
+    are skipped; queue depth and per-file latency are kept for /metrics.
+    """
+
+    def __init__(self, input_dir, output_dir, workers=1, timeout=None, fast=True,
+                 use_bookmarks=True, cache=None):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.timeout = timeout
+        self.fast = fast
+        self.use_bookmarks = use_bookmarks
+        self.cache = cache
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.pool = multiprocessing.Pool(processes=max(workers, 1), initializer=_init_worker)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+        # Finished outlines are cached by a writer thread of their own, off
+        # the pool's result-handler thread; cache_lock guards the cache's
+        # in-memory index between it and the submitting threads.
+        self.cache_lock = threading.Lock()
+        self.cache_writes = queue.Queue()
+        self.cache_writer = None
+        if cache is not None:
+            self.cache_writer = threading.Thread(target=self._write_cache, daemon=True)
+            self.cache_writer.start()
+
+        self.scanned_stamps = {}   # path -> (size, mtime) seen on the last scan
+        self.submitted_stamps = {} # path -> (size, mtime) last handed to a worker
+        self.digests = {}          # path -> content hash of the last processed version
+        self.in_flight = {}        # path -> submit time
+        self.resubmit = set()      # paths that changed while being processed
+        self.retry = set()         # finished paths to queue again, see watch()
+
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.cache_hits = 0
+        self.recent_latencies = []
+        self.file_latencies = {}
+
+    def output_path_for(self, pdf_path):
+        name = os.path.splitext(os.path.basename(pdf_path))[0]
+        return os.path.join(self.output_dir, f"{name}.json")
+
+    def submit(self, pdf_path):
+        """Queues one PDF. Returns False when it is unchanged or already queued."""
+        pdf_path = os.path.abspath(pdf_path)
+        submitted_at = time.perf_counter()
+        # The path is claimed in the same locked section as the check, so the
+        # watcher and HTTP threads can never both queue it.
+        with self.lock:
+            if pdf_path in self.in_flight:
+                self.resubmit.add(pdf_path)
+                return False
+            self.in_flight[pdf_path] = submitted_at
+
+        output_path = self.output_path_for(pdf_path)
+        try:
+            digest = file_digest(pdf_path)
+            done = self._skip_or_reuse(pdf_path, digest, output_path, submitted_at)
+        except BaseException:
+            self._release(pdf_path)
+            raise
+        if done is not None:
+            self._release(pdf_path)
+            return done
+
+        self.pool.apply_async(
+            process_job,
+            (pdf_path, output_path, self.fast, self.timeout, self.use_bookmarks),
+            callback=lambda result: self._finished(pdf_path, digest, result),
+            error_callback=lambda error: self._failed(pdf_path, error),
+        )
+        return True
+
+    def _skip_or_reuse(self, pdf_path, digest, output_path, submitted_at):
+        """
+        Returns False for an unchanged file, True when its outline came from
+        the cache, and None when it still has to be processed.
+        """
+        with self.lock:
+            if self.digests.get(pdf_path) == digest and os.path.exists(output_path):
+                self.skipped += 1
+                return False
+        if self.cache is not None:
+            with self.cache_lock:
+                cached = self.cache.get(digest)
+            if cached is not None:
+                process_pdfs.write_outline(cached, output_path)
+                with self.lock:
+                    self.cache_hits += 1
+                    self._record(pdf_path, digest, submitted_at)
+                return True
+        return None
+
+    def _record(self, pdf_path, digest, submitted_at):
+        latency_ms = (time.perf_counter() - submitted_at) * 1000
+        self.digests[pdf_path] = digest
+        self.processed += 1
+        self.file_latencies[os.path.basename(pdf_path)] = round(latency_ms, 2)
+        self.recent_latencies.append(latency_ms)
+        del self.recent_latencies[:-LATENCY_WINDOW]
+        print(f"{os.path.basename(pdf_path)}: {latency_ms:.1f} ms", flush=True)
+
+    def _release(self, pdf_path):
+        # Ends a path's claim. A change seen meanwhile is queued again by the
+        # watcher: the pool's result-handler thread, which runs the callbacks,
+        # must not hash files or raise.
+        with self.lock:
+            self.in_flight.pop(pdf_path, None)
+            if pdf_path in self.resubmit:
+                self.resubmit.discard(pdf_path)
+                self.retry.add(pdf_path)
+
+    def _finished(self, pdf_path, digest, result):
+        with self.lock:
+            self._record(pdf_path, digest, self.in_flight[pdf_path])
+        self._release(pdf_path)
+        if self.cache is not None:
+            self.cache_writes.put((pdf_path, digest, result))
+
+    def _write_cache(self):
+        while True:
+            item = self.cache_writes.get()
+            if item is None:
+                return
+            pdf_path, digest, result = item
+            try:
+                with self.cache_lock:
+                    self.cache.put(digest, result)
+            except Exception as e:
+                print(f"Warning: could not cache {os.path.basename(pdf_path)}: {e}", file=sys.stderr, flush=True)
+
+    def _failed(self, pdf_path, error):
+        print(f"Error processing {os.path.basename(pdf_path)}: {error}", file=sys.stderr, flush=True)
+        with self.lock:
+            self.failed += 1
+        self._release(pdf_path)
+
+    def submit_retries(self):
+        with self.lock:
+            retries, self.retry = self.retry, set()
+        for pdf_path in retries:
+            try:
+                self.submit(pdf_path)
+            except OSError as e:
+                print(f"Error queueing {pdf_path}: {e}", file=sys.stderr, flush=True)
+
+    def scan(self):
+        # A file is only picked up once its size and mtime have been stable
+        # for one poll interval, so half-copied PDFs are not parsed.
+        current = {}
+        for entry in os.scandir(self.input_dir):
+            if entry.is_file() and entry.name.lower().endswith(".pdf"):
+                stat = entry.stat()
+                current[os.path.abspath(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+
+        for pdf_path, stamp in current.items():
+            stable = self.scanned_stamps.get(pdf_path) == stamp
+            if stable and self.submitted_stamps.get(pdf_path) != stamp:
+                self.submitted_stamps[pdf_path] = stamp
+                try:
+                    self.submit(pdf_path)
+                except OSError as e:
+                    print(f"Error queueing {pdf_path}: {e}", file=sys.stderr, flush=True)
+        self.scanned_stamps = current
+
+    def watch(self, poll_interval=POLL_INTERVAL, scan=True):
+        # Without scan, only files that changed while being processed are
+        # queued again.
+        while not self.stop_event.is_set():
+            self.submit_retries()
+            if scan:
+                self.scan()
+            self.stop_event.wait(poll_interval)
+
+    def metrics(self):
+        with self.lock:
+            latencies = sorted(self.recent_latencies)
+            return {
+                "queue_depth": len(self.in_flight),
+                "processed": self.processed,
+                "failed": self.failed,
+                "skipped_unchanged": self.skipped,
+                "cache_hits": self.cache_hits,
+                "latency_ms": {
+                    "p50": _percentile(latencies, 0.5),
+                    "p95": _percentile(latencies, 0.95),
+                    "max": latencies[-1] if latencies else None,
+                },
+                "files": dict(self.file_latencies),
+            }
+
+    def close(self):
+        self.stop_event.set()
+        self.pool.terminate()
+        self.pool.join()
+        if self.cache_writer is not None:
+            # Outlines already finished are still cached before exiting
+            self.cache_writes.put(None)
+            self.cache_writer.join()
+
+def make_handler(service):
+    class JobHandler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok"})
+            elif self.path == "/metrics":
+                self._send(200, service.metrics())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/jobs":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                job = json.loads(self.rfile.read(length) or b"{}")
+                pdf_path = os.path.join(service.input_dir, job["path"])
+            except (ValueError, KeyError, TypeError):
+                self._send(400, {"error": "expected a JSON body like {\"path\": \"file.pdf\"}"})
+                return
+            # Only files inside the input folder are processed
+            input_dir = os.path.realpath(service.input_dir)
+            if os.path.commonpath([input_dir, os.path.realpath(pdf_path)]) != input_dir:
+                self._send(400, {"error": f"{job['path']} is outside the input directory"})
+                return
+            if not os.path.isfile(pdf_path):
+                self._send(404, {"error": f"{job['path']} not found"})
+                return
+            try:
+                queued = service.submit(pdf_path)
+            except FileNotFoundError:
+                self._send(404, {"error": f"{job['path']} not found"})
+                return
+            except OSError as e:
+                self._send(500, {"error": f"could not queue {job['path']}: {e}"})
+                return
+            self._send(202, {"queued": queued, "output": service.output_path_for(pdf_path)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return JobHandler
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Resident outline extraction service.")
+    parser.add_argument("--input-dir", default="/app/input")
+    parser.add_argument("--output-dir", default="/app/output")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes; 0 uses every available core")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds allowed per file")
+    parser.add_argument("--exact-glyphs", action="store_true")
+    parser.add_argument("--no-bookmarks", action="store_true")
+    parser.add_argument("--cache-dir", default=os.getenv("OUTLINE_CACHE_DIR"))
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="0 disables the HTTP endpoint")
+    parser.add_argument("--no-watch", action="store_true",
+                        help="only accept jobs over HTTP instead of polling the input directory")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    cache = None
+    if args.cache_dir:
+        cache = OutlineCache(
+            args.cache_dir,
+            process_pdfs.extraction_params(not args.exact_glyphs, not args.no_bookmarks),
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+        )
+        cache.invalidate_stale()
+
+    service = OutlineService(
+        args.input_dir,
+        args.output_dir,
+        workers=workers,
+        timeout=args.timeout,
+        fast=not args.exact_glyphs,
+        use_bookmarks=not args.no_bookmarks,
+        cache=cache,
+    )
+
+    server = None
+    if args.port:
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Listening on http://{args.host}:{args.port}", flush=True)
+
+    try:
+        if not args.no_watch:
+            print(f"Watching {args.input_dir}", flush=True)
+        service.watch(args.poll_interval, scan=not args.no_watch)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.shutdown()
+        service.close()
@@ -1,130 +1,876 @@
-import os
-import json
-import pdfplumber
-import numpy as np
-from collections import defaultdict
-
-def extract_title(page):
-    top_area = page.crop((0, 0, page.width, page.height * 0.2))
-    words = top_area.extract_words(
-        keep_blank_chars=False,
-        extra_attrs=["size"],
-        use_text_flow=True
-    )
-    if not words:
-        return ""
-    
-    font_sizes = [w["size"] for w in words]
-    max_size = max(font_sizes) if font_sizes else 0
-    title_words = [w["text"] for w in words if w["size"] == max_size]
-    return "".join(title_words).strip()
-
-def process_page(page):
-    words = page.extract_words(
-        keep_blank_chars=False,
-        extra_attrs=["size"],
-        use_text_flow=True
-    )
-    if not words:
-        return [], 0
-    
-    size_counter = defaultdict(int)
-    for word in words:
-        size_counter[round(word["size"], 1)] += 1
-    body_size = max(size_counter.items(), key=lambda x: x[1])[0] if size_counter else 0
-
-    lines = defaultdict(list)
-    for word in words:
-        line_key = round(word["top"] / 5) * 5
-        lines[line_key].append(word)
-    
-    candidates = []
-    for line_key in sorted(lines.keys()):
-        line_words = lines[line_key]
-        line_words.sort(key=lambda w: w["x0"])
-        
-        text = "".join(w["text"] for w in line_words).strip()
-        if not text or len(text) < 2:
-            continue
-            
-        avg_size = sum(w["size"] for w in line_words) / len(line_words)
-        min_top = min(w["top"] for w in line_words)
-        
-        is_large_font = avg_size >= body_size * 1.5
-        is_top_position = min_top < page.height * 0.15
-        
-        if is_large_font or is_top_position:
-            candidates.append({
-                "text": text,
-                "size": avg_size,
-                "top": min_top,
-                "page": page.page_number
-            })
-    
-    return candidates, body_size
-
-def assign_levels(candidates):
-    if not candidates:
-        return []
-    
-    sizes = [c["size"] for c in candidates]
-    if len(sizes) < 3:
-        for i, c in enumerate(candidates):
-            c["level"] = f"H{min(i+1, 3)}"
-        return candidates
-    
-    q33 = np.quantile(sizes, 0.33)
-    q66 = np.quantile(sizes, 0.66)
-    
-    for c in candidates:
-        if c["size"] >= q66:
-            c["level"] = "H1"
-        elif c["size"] >= q33:
-            c["level"] = "H2"
-        else:
-            c["level"] = "H3"
-    
-    return candidates
-
-def process_pdf(path):
-    with pdfplumber.open(path) as pdf:
-        title = extract_title(pdf.pages[0]) if pdf.pages else ""
-        
-        all_candidates = []
-        for page in pdf.pages:
-            candidates, _ = process_page(page)
-            all_candidates.extend(candidates)
-        
-        headings = assign_levels(all_candidates)
-        headings.sort(key=lambda x: (x["page"], x["top"]))
-        
-        return {
-            "title": title,
-            "outline": [
-                {"level": h["level"], "text": h["text"], "page": h["page"]}
-                for h in headings
-            ]
-        }
-
-if __name__ == "__main__":
-    INPUT_DIR = "/app/input"
-    OUTPUT_DIR = "/app/output"
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    
-    processed_count = 0
-    for filename in os.listdir(INPUT_DIR):
-        if filename.lower().endswith(".pdf"):
-            pdf_path = os.path.join(INPUT_DIR, filename)
-            result = process_pdf(pdf_path)
-            
-            output_filename = f"{os.path.splitext(filename)[0]}.json"
-            output_path = os.path.join(OUTPUT_DIR, output_filename)
-            
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
-            
-            processed_count += 1
-    
-    if processed_count == 0:
-        with open(os.path.join(OUTPUT_DIR, "output.json"), "w") as f:
-            json.dump({"title": "", "outline": []}, f)
\ No newline at end of file
+import os
+import sys
+import json
+import math
+import signal
+import time
+import textwrap
+import argparse
+import multiprocessing
+import difflib
+import functools
+import unicodedata
+import pdfplumber
+import numpy as np
+import pipeline_metrics
+from pipeline_metrics import stage
+from array import array
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from pdfminer.layout import LTChar
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import PDFObjRef, resolve1
+from pdfminer.psparser import PSLiteral
+from pdfplumber.page import Page
+from pdfplumber.utils import extract_words
+from outline_cache import DEFAULT_MAX_BYTES, OutlineCache, file_digest, params_fingerprint
+from document_model import (
+    DOCUMENT_MODEL_VERSION, build_sections, document_path_for, load_document,
+    outline_from_document, save_document,
+)
+
+# Large PDFs are split into page ranges of this size so that one long
+# document can be spread over several workers in batch mode.
+PAGES_PER_SHARD = 50
+
+# --- Outline heuristics ---
+# Bump HEURISTICS_VERSION whenever the extraction logic changes in a way the
+# constants below do not capture; cached outlines are keyed on both.
+HEURISTICS_VERSION = 1
+TITLE_AREA_FRACTION = 0.2
+TOP_POSITION_FRACTION = 0.15
+LARGE_FONT_FACTOR = 1.5
+LINE_BUCKET_SIZE = 5
+LEVEL_QUANTILES = (0.33, 0.66)
+
+# An embedded bookmark outline is used instead of the layout heuristics
+# when it has at least this many entries and nearly all of them point at a
+# page of the document.
+BOOKMARK_MIN_ENTRIES = 2
+BOOKMARK_MIN_RESOLVED = 0.9
+# A bookmark's heading line in the document model is the first line on its
+# page whose text matches at least this share of the title's leading
+# characters, with this similarity.
+BOOKMARK_LINE_MIN_PREFIX = 0.5
+BOOKMARK_LINE_MATCH = 0.8
+
+# Every page is parsed once into a PageWords record: the word texts plus
+# compact columns of the only attributes the outline heuristics read. Title
+# and heading detection both work from this record.
+PageWords = namedtuple(
+    "PageWords",
+    ["page_number", "width", "height", "text", "size", "top", "bottom", "x0", "x1"]
+)
+
+WORD_OPTIONS = {
+    "keep_blank_chars": False,
+    "extra_attrs": ["size"],
+    "use_text_flow": True,
+}
+
+def _layout_chars(layout_objects, page):
+    # Reads glyphs straight from pdfminer's layout tree, skipping the full
+    # attribute dictionaries pdfplumber builds for every object on the page.
+    # Coordinates are shifted by the mediabox origin exactly as pdfplumber's
+    # Page.process_object does, so the words match page.extract_words().
+    mb_x0, mb_top = page.mediabox[:2]
+    height = page.height
+    unicode_norm = page.pdf.unicode_norm
+    for obj in _iter_layout_chars(layout_objects):
+        text = obj.get_text()
+        if unicode_norm is not None:
+            text = unicodedata.normalize(unicode_norm, text)
+        top = height - obj.y1 + mb_top
+        yield {
+            "text": text,
+            "fontname": obj.fontname,
+            "size": obj.size,
+            "upright": obj.upright,
+            "matrix": obj.matrix,
+            "x0": obj.x0 + mb_x0,
+            "x1": obj.x1 + mb_x0,
+            "top": top,
+            "bottom": height - obj.y0 + mb_top,
+            "doctop": page.initial_doctop + top,
+            "width": obj.width,
+            "height": obj.height,
+        }
+
+def _iter_layout_chars(layout_objects):
+    for obj in layout_objects:
+        if isinstance(obj, LTChar):
+            yield obj
+        elif hasattr(obj, "_objs"):
+            yield from _iter_layout_chars(obj._objs)
+
+def analyze_page(page, fast=True):
+    if fast:
+        chars = list(_layout_chars(page.layout._objs, page))
+        words = extract_words(chars, **WORD_OPTIONS)
+    else:
+        words = page.extract_words(**WORD_OPTIONS)
+
+    return PageWords(
+        page_number=page.page_number,
+        width=page.width,
+        height=page.height,
+        text=[w["text"] for w in words],
+        size=array("d", (w["size"] for w in words)),
+        top=array("d", (w["top"] for w in words)),
+        bottom=array("d", (w["bottom"] for w in words)),
+        x0=array("d", (w["x0"] for w in words)),
+        x1=array("d", (w["x1"] for w in words)),
+    )
+
+def release_page(page):
+    close = getattr(page, "close", None)
+    if close is not None:
+        close()
+    else:
+        page.flush_cache()
+
+def iter_page_words(pages, fast=True):
+    for page in pages:
+        try:
+            with stage("parse_page", page.page_number):
+                words = analyze_page(page, fast)
+            pipeline_metrics.count("pages")
+            yield words
+        finally:
+            release_page(page)
+
+def open_pdf(path):
+    with stage("open"):
+        return pdfplumber.open(path)
+
+def load_pages(pdf):
+    # pdf.pages walks the whole page tree on first access
+    with stage("load_pages"):
+        return pdf.pages
+
+def extract_title(words):
+    # Words overlapping the top 20% of the page, i.e. what cropping the page
+    # to that band would have kept.
+    limit = words.height * TITLE_AREA_FRACTION
+    top_area = [
+        i for i in range(len(words.text))
+        if words.top[i] <= limit and words.bottom[i] >= 0
+        and words.x0[i] <= words.width and words.x1[i] >= 0
+    ]
+    if not top_area:
+        return ""
+    
+    max_size = max(words.size[i] for i in top_area)
+    title_words = [words.text[i] for i in top_area if words.size[i] == max_size]
+    return "".join(title_words).strip()
+
+def _body_size(sizes):
+    # Most common size rounded to one decimal, ties going to the size seen
+    # first on the page. Only the distinct sizes go through Python's round(),
+    # which rounds differently from np.round at some .x5 boundaries.
+    unique_sizes, first_index, counts = np.unique(sizes, return_index=True, return_counts=True)
+    totals = {}
+    for size, first, count in zip(unique_sizes.tolist(), first_index.tolist(), counts.tolist()):
+        key = round(size, 1)
+        seen_first, seen_count = totals.get(key, (first, 0))
+        totals[key] = (min(seen_first, first), seen_count + count)
+    return max(totals.items(), key=lambda x: (x[1][1], -x[1][0]))[0]
+
+def _line_sizes(sizes, starts, lengths):
+    # Sums each line left to right, one word position at a time across all
+    # lines, so averages match a plain sum() over the line bit for bit.
+    totals = np.zeros(len(starts))
+    for position in range(int(lengths.max())):
+        active = lengths > position
+        totals[active] += sizes[starts[active] + position]
+    return totals / lengths
+
+def _line_groups(words):
+    sizes = np.frombuffer(words.size, dtype=np.float64)
+    tops = np.frombuffer(words.top, dtype=np.float64)
+    x0s = np.frombuffer(words.x0, dtype=np.float64)
+
+    body_size = _body_size(sizes)
+
+    # Order words by line bucket, then x0, then original position.
+    line_keys = np.rint(tops / LINE_BUCKET_SIZE) * LINE_BUCKET_SIZE
+    order = np.lexsort((np.arange(len(sizes)), x0s, line_keys))
+    sorted_keys = line_keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    lengths = np.diff(np.r_[starts, len(order)])
+
+    avg_sizes = _line_sizes(sizes[order], starts, lengths)
+    min_tops = np.minimum.reduceat(tops[order], starts)
+    return body_size, order, starts, lengths, avg_sizes, min_tops
+
+def _is_candidate(words, body_size, avg_sizes, min_tops):
+    is_large_font = avg_sizes >= body_size * LARGE_FONT_FACTOR
+    is_top_position = min_tops < words.height * TOP_POSITION_FRACTION
+    return is_large_font | is_top_position
+
+def _candidate(words, text, line, avg_sizes, min_tops):
+    return {
+        "text": text,
+        "size": float(avg_sizes[line]),
+        "top": float(min_tops[line]),
+        "page": words.page_number
+    }
+
+def process_page(words):
+    if not words.text:
+        return [], 0
+
+    body_size, order, starts, lengths, avg_sizes, min_tops = _line_groups(words)
+
+    candidates = []
+    for line in np.flatnonzero(_is_candidate(words, body_size, avg_sizes, min_tops)).tolist():
+        start = starts[line]
+        text = "".join(words.text[i] for i in order[start:start + lengths[line]]).strip()
+        if not text or len(text) < 2:
+            continue
+        candidates.append(_candidate(words, text, line, avg_sizes, min_tops))
+    
+    return candidates, body_size
+
+def page_layout(words):
+    """Every text line of a page plus the heading candidates process_page
+    would return, each candidate carrying the index of its line."""
+    if not words.text:
+        return [], [], 0
+
+    body_size, order, starts, lengths, avg_sizes, min_tops = _line_groups(words)
+    bottoms = np.frombuffer(words.bottom, dtype=np.float64)
+    max_bottoms = np.maximum.reduceat(bottoms[order], starts)
+    is_candidate = _is_candidate(words, body_size, avg_sizes, min_tops)
+
+    lines = []
+    candidates = []
+    for line in range(len(starts)):
+        line_words = [words.text[i] for i in order[starts[line]:starts[line] + lengths[line]]]
+        # Words never contain spaces, so joining without them gives the
+        # outline text process_page produces.
+        text = " ".join(line_words).strip()
+        if not text:
+            continue
+        if is_candidate[line]:
+            outline_text = "".join(line_words).strip()
+            if len(outline_text) >= 2:
+                candidate = _candidate(words, outline_text, line, avg_sizes, min_tops)
+                candidate["line"] = len(lines)
+                candidates.append(candidate)
+        lines.append({
+            "text": text,
+            "size": float(avg_sizes[line]),
+            "top": float(min_tops[line]),
+            "bottom": float(max_bottoms[line])
+        })
+    return lines, candidates, body_size
+
+def assign_levels(candidates):
+    if not candidates:
+        return []
+    
+    sizes = [c["size"] for c in candidates]
+    if len(sizes) < 3:
+        for i, c in enumerate(candidates):
+            c["level"] = f"H{min(i+1, 3)}"
+        return candidates
+    
+    q33 = np.quantile(sizes, LEVEL_QUANTILES[0])
+    q66 = np.quantile(sizes, LEVEL_QUANTILES[1])
+    
+    for c in candidates:
+        c["level"] = level_for_size(c["size"], q33, q66)
+    
+    return candidates
+
+def level_for_size(size, q33, q66):
+    if size >= q66:
+        return "H1"
+    elif size >= q33:
+        return "H2"
+    return "H3"
+
+class SizeHistogram:
+    """
+    Counts of candidate font sizes. Sizes repeat heavily across a document,
+    so this stays small however many pages are processed, and it answers
+    quantile queries exactly as np.quantile would over the full list.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.total = 0
+
+    def add(self, size):
+        self.counts[size] += 1
+        self.total += 1
+
+    def _value_at(self, rank, sorted_sizes):
+        seen = 0
+        for size in sorted_sizes:
+            seen += self.counts[size]
+            if rank < seen:
+                return size
+        return sorted_sizes[-1]
+
+    def quantile(self, q):
+        # Same virtual index and interpolation as numpy's default "linear"
+        # method, so levels match assign_levels bit for bit.
+        n = self.total
+        virtual_index = (n - 1) * q
+        previous_index = min(max(math.floor(virtual_index), 0), n - 1)
+        next_index = min(previous_index + 1, n - 1)
+        sorted_sizes = sorted(self.counts)
+        a = self._value_at(previous_index, sorted_sizes)
+        b = self._value_at(next_index, sorted_sizes)
+        t = virtual_index - previous_index
+        diff_b_a = b - a
+        if t >= 0.5:
+            return b - diff_b_a * (1 - t)
+        return a + diff_b_a * t
+
+def build_outline(title, candidates):
+    with stage("assign_levels"):
+        headings = assign_levels(candidates)
+        headings.sort(key=lambda x: (x["page"], x["top"]))
+
+    return {
+        "title": title,
+        "outline": [
+            {"level": h["level"], "text": h["text"], "page": h["page"]}
+            for h in headings
+        ]
+    }
+
+def _page_ids(pdf):
+    return [page_obj.pageid for page_obj in PDFPage.create_pages(pdf.doc)]
+
+def _bookmark_page(doc, dest, action, page_numbers):
+    if dest is None and action is not None:
+        action = resolve1(action)
+        if isinstance(action, dict) and getattr(action.get("S"), "name", None) == "GoTo":
+            dest = action.get("D")
+
+    dest = resolve1(dest)
+    if isinstance(dest, PSLiteral):
+        dest = resolve1(doc.get_dest(dest.name))
+    elif isinstance(dest, (bytes, str)):
+        dest = resolve1(doc.get_dest(dest))
+    if isinstance(dest, dict):
+        dest = resolve1(dest.get("D"))
+
+    if isinstance(dest, list) and dest:
+        target = dest[0]
+        if isinstance(target, PDFObjRef):
+            return page_numbers.get(target.objid)
+        if isinstance(target, int) and 0 <= target < len(page_numbers):
+            return target + 1
+    return None
+
+def read_bookmarks(pdf, page_ids=None):
+    """
+    Maps the PDF's /Outlines tree to outline entries, nesting depth 1, 2 and
+    3+ becoming H1, H2 and H3. Returns None when the document has no
+    bookmarks or they fail the sanity check, so the caller can fall back to
+    the layout heuristics.
+    """
+    if page_ids is None:
+        page_ids = _page_ids(pdf)
+    page_numbers = {page_id: index + 1 for index, page_id in enumerate(page_ids)}
+
+    try:
+        entries = list(pdf.doc.get_outlines())
+    except Exception:
+        return None
+
+    outline = []
+    for level, title, dest, action, _ in entries:
+        text = (title or "").strip()
+        try:
+            page = _bookmark_page(pdf.doc, dest, action, page_numbers)
+        except Exception:
+            page = None
+        if text and page is not None:
+            outline.append({"level": f"H{min(level, 3)}", "text": text, "page": page})
+
+    if len(outline) < BOOKMARK_MIN_ENTRIES:
+        return None
+    if len(outline) < BOOKMARK_MIN_RESOLVED * len(entries):
+        return None
+    return outline
+
+def _first_page_title(pdf, fast=True):
+    # Bookmarked PDFs still take their title from the first page, which is
+    # the only page that gets analysed.
+    first_page = next(iter_pages_streaming(pdf), None)
+    if first_page is None:
+        return ""
+    words = next(iter_page_words([first_page], fast))
+    with stage("title"):
+        return extract_title(words)
+
+def bookmark_title(path, timeout=None, fast=True):
+    with time_limit(timeout), pipeline_metrics.document(os.path.basename(path)):
+        with open_pdf(path) as pdf:
+            return _first_page_title(pdf, fast)
+
+def collect_candidates(pages, fast=True, with_title=True):
+    title = ""
+    all_candidates = []
+    for index, words in enumerate(iter_page_words(pages, fast)):
+        if with_title and index == 0:
+            with stage("title"):
+                title = extract_title(words)
+        with stage("process_page", words.page_number):
+            candidates, _ = process_page(words)
+        all_candidates.extend(candidates)
+    return title, all_candidates
+
+def _normalize(text):
+    return "".join(text.split()).lower()
+
+def _bookmark_line(lines, text):
+    # First line that starts like the bookmark title. Ligature glyphs often
+    # extract as replacement characters and long titles wrap, so a close
+    # match on the common prefix is accepted.
+    target = _normalize(text)
+    for index, line in enumerate(lines):
+        line_text = _normalize(line["text"])
+        length = min(len(line_text), len(target))
+        if not target or length < len(target) * BOOKMARK_LINE_MIN_PREFIX:
+            continue
+        if difflib.SequenceMatcher(None, target[:length], line_text[:length]).ratio() >= BOOKMARK_LINE_MATCH:
+            return index
+    return None
+
+def build_document(path, fast=True, use_bookmarks=True, timeout=None):
+    """Parses a PDF once into the document model described in
+    document_model.py. Its headings are exactly the outline process_pdf
+    returns for the same settings."""
+    with time_limit(timeout), pipeline_metrics.document(os.path.basename(path)):
+        with open_pdf(path) as pdf:
+            with stage("bookmarks"):
+                bookmarks = read_bookmarks(pdf) if use_bookmarks else None
+            title = ""
+            pages = []
+            candidates = []
+            for index, words in enumerate(iter_page_words(load_pages(pdf), fast)):
+                if index == 0:
+                    with stage("title"):
+                        title = extract_title(words)
+                with stage("page_layout", words.page_number):
+                    lines, page_candidates, body_size = page_layout(words)
+                pages.append({
+                    "page_number": words.page_number,
+                    "width": float(words.width),
+                    "height": float(words.height),
+                    "body_size": float(body_size),
+                    "lines": lines
+                })
+                candidates.extend(page_candidates)
+
+        if bookmarks is not None:
+            headings = [
+                dict(b, line=_bookmark_line(pages[b["page"] - 1]["lines"], b["text"]))
+                for b in bookmarks
+            ]
+        else:
+            with stage("assign_levels"):
+                headings = [
+                    {"level": c["level"], "text": c["text"], "page": c["page"], "line": c["line"]}
+                    for c in sorted(assign_levels(candidates), key=lambda x: (x["page"], x["top"]))
+                ]
+
+        with stage("build_sections"):
+            sections = build_sections(pages, headings)
+        return {
+            "version": DOCUMENT_MODEL_VERSION,
+            "source": os.path.basename(path),
+            "digest": file_digest(path),
+            "params": params_fingerprint(extraction_params(fast, use_bookmarks)),
+            "title": title,
+            "pages": pages,
+            "headings": headings,
+            "sections": sections
+        }
+
+def process_pdf(path, fast=True, use_bookmarks=True, document=None):
+    # A document model of this PDF (build_document / load_document) already
+    # holds the outline, so the file is not parsed again.
+    if document is not None:
+        return outline_from_document(document)
+    with pipeline_metrics.document(os.path.basename(path)), open_pdf(path) as pdf:
+        if use_bookmarks:
+            with stage("bookmarks"):
+                outline = read_bookmarks(pdf)
+            if outline is not None:
+                return {"title": _first_page_title(pdf, fast), "outline": outline}
+        title, all_candidates = collect_candidates(load_pages(pdf), fast)
+        return build_outline(title, all_candidates)
+
+def extraction_params(fast=True, use_bookmarks=True):
+    return {
+        "heuristics_version": HEURISTICS_VERSION,
+        "title_area_fraction": TITLE_AREA_FRACTION,
+        "top_position_fraction": TOP_POSITION_FRACTION,
+        "large_font_factor": LARGE_FONT_FACTOR,
+        "line_bucket_size": LINE_BUCKET_SIZE,
+        "level_quantiles": list(LEVEL_QUANTILES),
+        "word_options": WORD_OPTIONS,
+        "fast_glyphs": fast,
+        "bookmarks": [BOOKMARK_MIN_ENTRIES, BOOKMARK_MIN_RESOLVED] if use_bookmarks else None,
+    }
+
+def iter_pages_streaming(pdf):
+    # pdf.pages keeps a Page object for every page alive until the PDF is
+    # closed; walking pdfminer's page tree builds one page at a time instead.
+    # Object caching is switched off so parsed content streams are not
+    # retained for the whole document either.
+    pdf.doc.caching = False
+    doctop = 0
+    for index, page_obj in enumerate(PDFPage.create_pages(pdf.doc)):
+        page = Page(pdf, page_obj, page_number=index + 1, initial_doctop=doctop)
+        doctop += page.height
+        yield page
+
+def _format_outline_entry(entry):
+    return textwrap.indent(json.dumps(entry, ensure_ascii=False, indent=2), "    ")
+
+def process_pdf_streaming(path, output_path, fast=True, timeout=None):
+    """
+    Bounded-memory variant of process_pdf for very large documents. Heading
+    candidates are appended to <output_path>.candidates.jsonl as each page is
+    finished and only their font sizes are kept in memory. Once the last page
+    is done the levels are assigned from the size histogram and the outline
+    is written to output_path in the same layout as write_outline.
+    """
+    spill_path = f"{output_path}.candidates.jsonl"
+    tmp_path = f"{output_path}.tmp"
+    try:
+        return _stream_outline(path, output_path, spill_path, tmp_path, fast, timeout)
+    finally:
+        for leftover in (spill_path, tmp_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+def _stream_outline(path, output_path, spill_path, tmp_path, fast, timeout):
+    histogram = SizeHistogram()
+    title = ""
+
+    with time_limit(timeout), pipeline_metrics.document(os.path.basename(path)):
+        with open_pdf(path) as pdf, open(spill_path, "w", encoding="utf-8") as spill:
+            pages = iter_pages_streaming(pdf)
+            for index, words in enumerate(iter_page_words(pages, fast)):
+                if index == 0:
+                    with stage("title"):
+                        title = extract_title(words)
+                with stage("process_page", words.page_number):
+                    candidates, _ = process_page(words)
+                for c in candidates:
+                    histogram.add(c["size"])
+                    spill.write(json.dumps(c, ensure_ascii=False) + "\n")
+                spill.flush()
+
+    if histogram.total >= 3:
+        q33 = histogram.quantile(LEVEL_QUANTILES[0])
+        q66 = histogram.quantile(LEVEL_QUANTILES[1])
+
+    # Candidates are produced in (page, top) order already, so the spill file
+    # can be copied through without the sort build_outline performs.
+    with stage("write_json"), open(spill_path, "r", encoding="utf-8") as spill, \
+         open(tmp_path, "w", encoding="utf-8") as out:
+        out.write('{\n  "title": ' + json.dumps(title, ensure_ascii=False) + ',\n  "outline": [')
+        count = 0
+        for i, line in enumerate(spill):
+            c = json.loads(line)
+            if histogram.total < 3:
+                level = f"H{min(i+1, 3)}"
+            else:
+                level = level_for_size(c["size"], q33, q66)
+            entry = {"level": level, "text": c["text"], "page": c["page"]}
+            out.write(("\n" if count == 0 else ",\n") + _format_outline_entry(entry))
+            count += 1
+        out.write("]\n}" if count == 0 else "\n  ]\n}")
+    os.replace(tmp_path, output_path)
+    return count
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("per-file timeout exceeded")
+
+@contextmanager
+def time_limit(timeout):
+    # The worker (or the parent, while planning a file) interrupts itself, so
+    # a pathological PDF frees its process instead of holding it for the rest
+    # of the batch. SIGALRM only reaches the main thread.
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+def process_page_range(path, start=0, stop=None, timeout=None, fast=True):
+    """
+    Collects heading candidates for pages[start:stop] of one PDF. The title is
+    only extracted by the shard that owns the first page.
+    """
+    part = f"pages{start + 1}" if stop is not None or start else None
+    with time_limit(timeout), pipeline_metrics.document(os.path.basename(path), part):
+        with open_pdf(path) as pdf:
+            return collect_candidates(load_pages(pdf)[start:stop], fast, with_title=start == 0)
+
+def wait_for(task, deadline=None):
+    """
+    Returns the result of a pool task. Past the deadline (a time.monotonic()
+    value) the file counts as failed, which also covers a worker that was
+    killed and whose task the pool will never finish.
+    """
+    if deadline is None:
+        return task.get()
+    try:
+        return task.get(timeout=max(deadline - time.monotonic(), 0))
+    except multiprocessing.TimeoutError:
+        raise TimeoutError("per-file timeout exceeded") from None
+
+def plan_shards(page_count, pages_per_shard=PAGES_PER_SHARD):
+    if page_count <= pages_per_shard:
+        return [(0, None)]
+    return [
+        (start, start + pages_per_shard)
+        for start in range(0, page_count, pages_per_shard)
+    ]
+
+def _save_and_outline(document_path, results):
+    save_document(results[0], document_path)
+    return outline_from_document(results[0])
+
+def plan_file(path, output_path, pages_per_shard=None, timeout=None, fast=True,
+              stream=False, use_bookmarks=True, document_path=None):
+    """
+    Decides how one PDF will be processed. Returns the tasks to run, as
+    (function, args) pairs, and a function that merges their results into
+    the outline, or None when the tasks write output_path themselves.
+    With a document_path the whole file is parsed into a document model,
+    which is saved there and the outline derived from it.
+    """
+    if document_path is not None:
+        tasks = [(build_document, (path, fast, use_bookmarks, timeout))]
+        return tasks, functools.partial(_save_and_outline, document_path)
+
+    # Planning runs in the parent process, so it is held to the same per-file
+    # limit: a PDF whose page tree or bookmarks take forever to resolve must
+    # not stall the whole batch before any worker sees it.
+    with time_limit(timeout), open_pdf(path) as pdf, stage("bookmarks"):
+        page_ids = _page_ids(pdf)
+        outline = read_bookmarks(pdf, page_ids) if use_bookmarks else None
+
+    if outline is not None:
+        tasks = [(bookmark_title, (path, timeout, fast))]
+        return tasks, lambda results: {"title": results[0], "outline": outline}
+    if stream:
+        # Streaming files are never sharded: each one is processed front to
+        # back by a single worker so its memory use stays flat.
+        return [(process_pdf_streaming, (path, output_path, fast, timeout))], None
+
+    shards = plan_shards(len(page_ids), pages_per_shard) if pages_per_shard else [(0, None)]
+    tasks = [(process_page_range, (path, start, stop, timeout, fast)) for start, stop in shards]
+    return tasks, merge_shards
+
+def merge_shards(shard_results):
+    # Shards arrive in page order, so concatenating them reproduces the
+    # candidate order of the serial path before levels are assigned.
+    title = shard_results[0][0] if shard_results else ""
+    all_candidates = []
+    for _, candidates in shard_results:
+        all_candidates.extend(candidates)
+    return build_outline(title, all_candidates)
+
+def write_outline(result, output_path):
+    # Written under a temporary name and renamed, so readers watching the
+    # output directory never see a partially written file.
+    tmp_path = f"{output_path}.tmp"
+    with stage("write_json"), open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output_path)
+
+def run_batch(input_dir, output_dir, workers=1, timeout=None, pages_per_shard=PAGES_PER_SHARD,
+              fast=True, cache=None, stream=False, use_bookmarks=True, document_dir=None):
+    os.makedirs(output_dir, exist_ok=True)
+    filenames = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(".pdf"))
+
+    def output_path_for(filename):
+        return os.path.join(output_dir, f"{os.path.splitext(filename)[0]}.json")
+
+    if document_dir is not None:
+        os.makedirs(document_dir, exist_ok=True)
+        params = params_fingerprint(extraction_params(fast, use_bookmarks))
+
+    processed_count = 0
+    measured = pipeline_metrics.METRICS is not None
+    pool = multiprocessing.Pool(processes=workers) if workers > 1 else None
+    try:
+        jobs = []
+        for filename in filenames:
+            pdf_path = os.path.join(input_dir, filename)
+            output_path = output_path_for(filename)
+            try:
+                digest = None
+                document_path = None
+                if document_dir is not None:
+                    # Reuse the document model of an unchanged PDF; otherwise
+                    # build it, which also yields the outline.
+                    digest = file_digest(pdf_path)
+                    document_path = document_path_for(document_dir, filename)
+                    with stage("load_document"):
+                        document = load_document(document_path, digest, params)
+                    if document is not None:
+                        write_outline(process_pdf(pdf_path, document=document), output_path)
+                        processed_count += 1
+                        continue
+                elif cache is not None:
+                    digest = file_digest(pdf_path)
+                    cached = cache.get(digest)
+                    if cached is not None:
+                        write_outline(cached, output_path)
+                        processed_count += 1
+                        continue
+                tasks, merge = plan_file(
+                    pdf_path,
+                    output_path,
+                    pages_per_shard=pages_per_shard if pool is not None else None,
+                    timeout=timeout,
+                    fast=fast,
+                    stream=stream,
+                    use_bookmarks=use_bookmarks,
+                    document_path=document_path,
+                )
+            except Exception as e:
+                print(f"Error processing {filename}: {e}", file=sys.stderr)
+                continue
+            if pool is not None and measured:
+                # Workers report their stage timings along with the result
+                tasks = [pool.apply_async(pipeline_metrics.run_measured, task) for task in tasks]
+            elif pool is not None:
+                tasks = [pool.apply_async(func, func_args) for func, func_args in tasks]
+            jobs.append((filename, output_path, digest, tasks, merge))
+
+        # --timeout holds for a whole file, however many shards it has. Its
+        # clock starts once the previous file is done: the pool runs tasks in
+        # order, so from then on nothing queued ahead can delay its shards.
+        started = time.monotonic()
+        for filename, output_path, digest, tasks, merge in jobs:
+            deadline = started + timeout if timeout and pool is not None else None
+            try:
+                if pool is not None and measured:
+                    results = []
+                    for task in tasks:
+                        result, snapshot = wait_for(task, deadline)
+                        pipeline_metrics.METRICS.merge(snapshot)
+                        results.append(result)
+                elif pool is not None:
+                    results = [wait_for(task, deadline) for task in tasks]
+                else:
+                    results = [func(*func_args) for func, func_args in tasks]
+                if merge is not None:
+                    with pipeline_metrics.document(filename, profile=False):
+                        result = merge(results)
+                        write_outline(result, output_path)
+            except Exception as e:
+                print(f"Error processing {filename}: {e}", file=sys.stderr)
+                continue
+            finally:
+                started = time.monotonic()
+
+            processed_count += 1
+            if cache is not None:
+                # The outline is already written; a failed cache write only
+                # costs a miss on the next run.
+                try:
+                    if merge is not None:
+                        cache.put(digest, result)
+                    else:
+                        cache.put_file(digest, output_path)
+                except OSError as e:
+                    print(f"Warning: could not cache the outline of {filename}: {e}", file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    if processed_count == 0:
+        with open(os.path.join(output_dir, "output.json"), "w") as f:
+            json.dump({"title": "", "outline": []}, f)
+
+    return processed_count
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract heading outlines from PDFs.")
+    parser.add_argument("--input-dir", default="/app/input")
+    parser.add_argument("--output-dir", default="/app/output")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes; 0 uses every available core")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="seconds allowed per file, across all of its page ranges")
+    parser.add_argument("--pages-per-shard", type=int, default=PAGES_PER_SHARD)
+    parser.add_argument("--exact-glyphs", action="store_true",
+                        help="build words from pdfplumber's char objects instead of pdfminer's layout tree")
+    parser.add_argument("--stream", action="store_true",
+                        help="bounded-memory mode for very large PDFs")
+    parser.add_argument("--no-bookmarks", action="store_true",
+                        help="always use the layout heuristics, even for PDFs with a bookmark outline")
+    parser.add_argument("--cache-dir", default=os.getenv("OUTLINE_CACHE_DIR"),
+                        help="reuse outlines of unchanged PDFs from this directory")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024))
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="drop every cached outline before processing")
+    parser.add_argument("--document-dir", default=os.getenv("DOCUMENT_MODEL_DIR"),
+                        help="also write a document model per PDF here, for reuse by challenge_1b")
+    parser.add_argument("--metrics", action="store_true", default=bool(os.getenv("PIPELINE_METRICS")),
+                        help="write per-stage timings and peak memory to pipeline_metrics.json in the output directory")
+    parser.add_argument("--profile-document",
+                        help="profile the processing of this PDF (file name) into the output directory")
+    parser.add_argument("--profiler", choices=("cprofile", "pyinstrument"), default="cprofile")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    if args.metrics:
+        pipeline_metrics.enable()
+    if args.profile_document:
+        os.makedirs(args.output_dir, exist_ok=True)
+        pipeline_metrics.set_profile_target(args.profile_document, args.output_dir, args.profiler)
+
+    cache = None
+    if args.cache_dir:
+        cache = OutlineCache(
+            args.cache_dir,
+            extraction_params(not args.exact_glyphs, not args.no_bookmarks),
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+        )
+        if args.clear_cache:
+            cache.clear()
+        else:
+            # Only outlines of an older HEURISTICS_VERSION are dropped here;
+            # those of other settings age out through LRU eviction.
+            cache.invalidate_stale()
+
+    run_batch(
+        args.input_dir,
+        args.output_dir,
+        workers=workers,
+        timeout=args.timeout,
+        pages_per_shard=args.pages_per_shard,
+        fast=not args.exact_glyphs,
+        cache=cache,
+        stream=args.stream,
+        use_bookmarks=not args.no_bookmarks,
+        document_dir=args.document_dir,
+    )
+    if args.metrics:
+        pipeline_metrics.write(os.path.join(args.output_dir, "pipeline_metrics.json"))
@@ -0,0 +1,194 @@
+import os
+import random
+import argparse
+
+# Generates large synthetic PDFs for benchmarking: many pages, a title,
+# headings at two sizes and body text in English, French, Korean or
+# Japanese. No PDF library is needed; the files are written directly.
+#
+# Latin text uses the standard Helvetica font. Korean and Japanese use a
+# non-embedded Type0 font whose character codes are UCS-2 code points, with a
+# ToUnicode map so pdfplumber and PyPDF2 recover the text. Glyphs are not
+# embedded, so viewers may not render CJK text, but extraction works.
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 56
+TITLE_SIZE = 22
+HEADING_SIZES = (16, 13)
+BODY_SIZE = 10
+LEADING = 1.4
+
+WORDS = {
+    "en": ("travel city museum river guide hotel market history local food train "
+           "morning walk garden festival coast village wine castle bridge street "
+           "harbour evening route ticket season family group budget").split(),
+    "fr": ("voyage ville musée rivière guide hôtel marché histoire cuisine train "
+           "matin promenade jardin fête côte village vin château pont rue port "
+           "soirée itinéraire billet saison famille groupe été réservé").split(),
+    "ko": ("여행 도시 박물관 강 안내 호텔 시장 역사 음식 기차 아침 산책 정원 축제 "
+           "해안 마을 성 다리 거리 항구 저녁 경로 표 계절 가족 단체 예산").split(),
+    "ja": ("旅行 都市 博物館 川 案内 ホテル 市場 歴史 料理 電車 朝 散歩 庭園 祭り "
+           "海岸 村 城 橋 通り 港 夕方 経路 切符 季節 家族 団体 予算").split(),
+}
+# Japanese is written without spaces between words.
+WORD_SEPARATOR = {"en": " ", "fr": " ", "ko": " ", "ja": ""}
+CJK_LANGUAGES = ("ko", "ja")
+
+def _is_cjk(lang):
+    return lang in CJK_LANGUAGES
+
+def _text_width(text, size, lang):
+    # Helvetica averages about half an em per character; CJK glyphs are
+    # a full em wide (the font's default width).
+    return len(text) * size * (1.0 if _is_cjk(lang) else 0.5)
+
+def _sentence(rng, lang, words):
+    return WORD_SEPARATOR[lang].join(rng.choice(WORDS[lang]) for _ in range(words))
+
+def _wrap(text, size, lang, width):
+    lines = []
+    line = ""
+    for char in text:
+        if _text_width(line + char, size, lang) > width:
+            split = line.rfind(" ") if not lang == "ja" else -1
+            if split > 0:
+                lines.append(line[:split])
+                line = line[split + 1:]
+            else:
+                lines.append(line)
+                line = ""
+        line += char
+    if line.strip():
+        lines.append(line)
+    return lines
+
+def generate_pages(page_count, lang="en", seed=0):
+    """Returns page_count pages, each a list of (text, size, x, y) lines."""
+    rng = random.Random(f"{lang}-{seed}")
+    width = PAGE_WIDTH - 2 * MARGIN
+    pages = []
+    for page_number in range(1, page_count + 1):
+        lines = []
+        y = PAGE_HEIGHT - MARGIN
+        if page_number == 1:
+            y -= TITLE_SIZE
+            lines.append((_sentence(rng, lang, 4), TITLE_SIZE, MARGIN, y))
+            y -= TITLE_SIZE
+        while True:
+            if rng.random() < 0.3:
+                size = rng.choice(HEADING_SIZES)
+                heading = _sentence(rng, lang, rng.randint(2, 5))
+                if y - 2 * size * LEADING < MARGIN:
+                    break
+                y -= size * LEADING
+                lines.append((heading, size, MARGIN, y))
+            paragraph = _wrap(_sentence(rng, lang, rng.randint(20, 60)), BODY_SIZE, lang, width)
+            if y - BODY_SIZE * LEADING * (len(paragraph) + 1) < MARGIN:
+                break
+            for text in paragraph:
+                y -= BODY_SIZE * LEADING
+                lines.append((text, BODY_SIZE, MARGIN, y))
+            y -= BODY_SIZE * LEADING
+        pages.append(lines)
+    return pages
+
+def _latin_string(text):
+    data = text.encode("cp1252", errors="replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def _cjk_string(text):
+    return b"<" + "".join(f"{ord(c):04X}" for c in text if ord(c) <= 0xFFFF).encode("ascii") + b">"
+
+def _content_stream(lines, lang):
+    font, encode = ("/F2", _cjk_string) if _is_cjk(lang) else ("/F1", _latin_string)
+    parts = []
+    for text, size, x, y in lines:
+        parts.append(b"BT %s %d Tf 1 0 0 1 %.2f %.2f Tm " % (font.encode(), size, x, y) + encode(text) + b" Tj ET")
+    return b"\n".join(parts)
+
+def _to_unicode_cmap():
+    # Codes are UCS-2, so every code maps to itself (surrogates excluded).
+    ranges = [f"<{high:02X}00> <{high:02X}FF> <{high:02X}00>" for high in range(256) if not 0xD8 <= high <= 0xDF]
+    chunks = [ranges[i:i + 100] for i in range(0, len(ranges), 100)]
+    body = "\n".join(f"{len(chunk)} beginbfrange\n" + "\n".join(chunk) + "\nendbfrange" for chunk in chunks)
+    return (
+        "/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+        "/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+        "1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n"
+        f"{body}\nendcmap\nCMapName currentdict /CMap defineresource pop\nend\nend"
+    ).encode("ascii")
+
+def _stream(data):
+    return b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+
+def write_pdf(path, pages, lang="en"):
+    # Objects 1-7 are fixed: catalog, page tree, the two fonts and the CJK
+    # font's parts. Each page adds a page object and its content stream.
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /SyntheticCJK /Encoding /Identity-H "
+        b"/DescendantFonts [5 0 R] /ToUnicode 7 0 R >>",
+        b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /SyntheticCJK "
+        b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+        b"/FontDescriptor 6 0 R /DW 1000 /CIDToGIDMap /Identity >>",
+        b"<< /Type /FontDescriptor /FontName /SyntheticCJK /Flags 4 /FontBBox [0 -120 1000 880] "
+        b"/ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 700 /StemV 80 >>",
+        _stream(_to_unicode_cmap()),
+    ]
+    kids = []
+    for lines in pages:
+        page_id = len(objects) + 1
+        kids.append(b"%d 0 R" % page_id)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, page_id + 1)
+        )
+        objects.append(_stream(_content_stream(lines, lang)))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(pages)
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(out)
+    os.replace(tmp_path, path)
+
+def generate_corpus(output_dir, page_count=100, languages=tuple(WORDS), documents_per_language=1):
+    """Writes documents_per_language PDFs of page_count pages for each
+    language and returns their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for lang in languages:
+        for seed in range(documents_per_language):
+            path = os.path.join(output_dir, f"synthetic_{lang}_{seed + 1}.pdf")
+            write_pdf(path, generate_pages(page_count, lang, seed), lang)
+            paths.append(path)
+    return paths
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic multilingual PDFs for benchmarking.")
+    parser.add_argument("--output-dir", default="synthetic")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--languages", default=",".join(WORDS),
+                        help="comma-separated, from: " + ", ".join(WORDS))
+    parser.add_argument("--documents", type=int, default=1, help="documents per language")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    languages = [lang.strip() for lang in args.languages.split(",") if lang.strip()]
+    for path in generate_corpus(args.output_dir, args.pages, languages, args.documents):
+        print(path)
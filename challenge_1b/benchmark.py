@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import math
+import time
+import tempfile
+import argparse
+
+import PyPDF2
+
+import document_analyst as analyst
+import pipeline_metrics
+
+# The synthetic PDF generator and the document model format live with
+# challenge_1a. It is appended to the path so that this folder's modules
+# keep precedence.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "challenge_1a"))
+import synthetic_pdfs
+import document_model
+
+# Benchmark and golden-output regression check for analyze_documents.
+#
+# Every 'Collection*' folder is analyzed end to end and its output compared
+# with the shipped challenge1b_output.json, ignoring processing_timestamp.
+# A collection whose input lists PDFs that are not in its PDFs folder cannot
+# reproduce its golden output (Collection Multilingual is shipped without
+# IntroducingTourism.pdf and Japnese.pdf), so its check is reported as
+# skipped; it is still timed. A synthetic collection of large generated PDFs
+# (English, French, Korean, Japanese) is timed as well.
+#
+# The document model constants of both challenges are also compared, since
+# challenge_1b only reads the models challenge_1a writes when they agree.
+#
+# Per-document latency is the document's preparation time (extraction,
+# language detection, tokenization) as recorded by pipeline_metrics;
+# collection-wide indexing, scoring and ranking are reported separately.
+
+# Top-level stages of one document's preparation (see _prepare_sections)
+DOCUMENT_STAGES = ('extract', 'detect_language', 'tokenize')
+SYNTHETIC_PERSONA = "Travel Planner"
+SYNTHETIC_JOB = "Plan a trip of 4 days for a group of 10 college friends."
+
+def percentile(values, q):
+    # Nearest-rank percentile
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+def reset_caches():
+    analyst.TOKEN_CACHE.clear()
+    analyst.CJK_LINE_CACHE.clear()
+
+def check_document_model_format():
+    mismatched = [
+        f"{name}: {getattr(analyst, name)!r} != {getattr(document_model, name)!r}"
+        for name in ('DOCUMENT_MODEL_VERSION', 'DOCUMENT_MODEL_SUFFIX')
+        if getattr(analyst, name) != getattr(document_model, name)
+    ]
+    if mismatched:
+        return {"status": "mismatch", "reason": "; ".join(mismatched)}
+    return {"status": "ok"}
+
+def page_count(pdf_path):
+    with open(pdf_path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+def collection_inputs(collection_dir):
+    """
+    Returns (persona, job, pdf_paths, missing file names) for a collection.
+    """
+    with open(os.path.join(collection_dir, "challenge1b_input.json"), 'r', encoding='utf-8') as f:
+        input_data = json.load(f)
+    pdf_paths = []
+    missing = []
+    for doc_info in input_data.get("documents", []):
+        filename = doc_info.get("filename", "")
+        pdf_path = os.path.join(collection_dir, "PDFs", filename)
+        if os.path.isfile(pdf_path):
+            pdf_paths.append(pdf_path)
+        else:
+            missing.append(filename)
+    persona = input_data.get("persona", {}).get("role", "Unknown Persona")
+    job = input_data.get("job_to_be_done", {}).get("task", "Unknown Task")
+    return persona, job, pdf_paths, missing
+
+def without_timestamp(output):
+    metadata = {k: v for k, v in output['metadata'].items() if k != 'processing_timestamp'}
+    return {**output, 'metadata': metadata}
+
+def check_golden(collection_dir, output, missing):
+    if missing:
+        return {"status": "skipped", "reason": f"PDFs not found: {', '.join(missing)}"}
+    golden_path = os.path.join(collection_dir, "challenge1b_output.json")
+    if not os.path.isfile(golden_path):
+        return {"status": "skipped", "reason": "no challenge1b_output.json"}
+    with open(golden_path, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+    return {"status": "ok" if without_timestamp(output) == without_timestamp(golden) else "mismatch"}
+
+def run_collection(pdf_paths, persona, job, scoring):
+    """
+    Analyzes one collection with cold caches and stage metrics enabled.
+    Returns (output, timings).
+    """
+    reset_caches()
+    metrics = pipeline_metrics.enable()
+    start = time.perf_counter()
+    output = analyst.analyze_documents(pdf_paths, persona, job, scoring=scoring)
+    total = time.perf_counter() - start
+    pipeline_metrics.METRICS = None
+
+    latencies = [
+        sum(document['stages'].get(name, [0, 0.0])[1] for name in DOCUMENT_STAGES)
+        for document in metrics.documents.values()
+    ]
+    pages = sum(page_count(p) for p in pdf_paths)
+    stages = metrics.stages
+    timings = {
+        "documents": len(pdf_paths),
+        "pages": pages,
+        "seconds": round(total, 3),
+        "docs_per_second": round(len(pdf_paths) / total, 3) if total else None,
+        "pages_per_second": round(pages / total, 2) if total else None,
+        "latency_p50_seconds": round(percentile(latencies, 0.50), 3) if latencies else None,
+        "latency_p99_seconds": round(percentile(latencies, 0.99), 3) if latencies else None,
+        "index_score_rank_seconds": round(sum(stages.get(name, [0, 0.0])[1] for name in ('index', 'score', 'rank')), 3),
+        # Hits and misses of the token and CJK line caches
+        "cache_counters": {name: n for name, n in sorted(metrics.counters.items())
+                           if name.endswith(('_hits', '_misses'))},
+        # Peak of the whole benchmark process so far, not of this collection
+        "peak_rss_mb": metrics.to_dict()['peak_memory_mb']['main'],
+    }
+    return output, timings
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark analyze_documents and check the golden outputs.")
+    parser.add_argument("--collections", help="comma-separated collection folders (default: every 'Collection*' folder)")
+    parser.add_argument("--scoring", default=analyst.SCORING_METHOD, choices=('overlap', 'bm25'),
+                        help="golden outputs were produced with the default")
+    parser.add_argument("--synthetic-pages", type=int, default=50,
+                        help="pages per synthetic PDF; 0 skips the synthetic collection")
+    parser.add_argument("--synthetic-languages", default=",".join(synthetic_pdfs.WORDS))
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.collections:
+        collections = [c.strip() for c in args.collections.split(',') if c.strip()]
+    else:
+        collections = sorted(d for d in os.listdir('.') if d.startswith('Collection') and os.path.isdir(d))
+
+    results = {"document_model_format": check_document_model_format(), "collections": {}}
+    for collection in collections:
+        persona, job, pdf_paths, missing = collection_inputs(collection)
+        output, timings = run_collection(pdf_paths, persona, job, args.scoring)
+        if args.scoring == analyst.SCORING_METHOD:
+            golden = check_golden(collection, output, missing)
+        else:
+            golden = {"status": "skipped", "reason": f"golden outputs use '{analyst.SCORING_METHOD}' scoring"}
+        results["collections"][collection] = {**timings, "golden": golden}
+
+    if args.synthetic_pages > 0:
+        languages = [lang.strip() for lang in args.synthetic_languages.split(',') if lang.strip()]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_paths = synthetic_pdfs.generate_corpus(tmp_dir, args.synthetic_pages, languages)
+            _, results["synthetic"] = run_collection(pdf_paths, SYNTHETIC_PERSONA, SYNTHETIC_JOB, args.scoring)
+
+    print(json.dumps(results, indent=4, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+
+    if results["document_model_format"]["status"] == "mismatch":
+        print(f"Document model format mismatch with challenge_1a: {results['document_model_format']['reason']}",
+              file=sys.stderr)
+    mismatches = [name for name, result in results["collections"].items() if result["golden"]["status"] == "mismatch"]
+    if mismatches:
+        print(f"Golden output mismatch: {', '.join(mismatches)}", file=sys.stderr)
+    if mismatches or results["document_model_format"]["status"] == "mismatch":
+        exit(1)
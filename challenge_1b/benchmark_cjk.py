@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import document_analyst as analyst
+
+# Compares the two CJK tokenization modes of document_analyst ('morph' and
+# 'ngram') on the documents of one language in a collection: tokenization
+# throughput, and how closely the rankings produced by the two modes agree.
+#
+# Agreement is measured with pseudo-queries: the title of every section is
+# used as a query against the whole document set, in both modes. For each
+# query we report the overlap of the two top-k section lists and, per mode,
+# how often the section the title came from is ranked first.
+
+def section_key(section):
+    return (section['document'], section['page_number'], section['section_title'])
+
+def top_sections(output, k):
+    """
+    The k best ranked sections of a challenge1b output, best first.
+    """
+    ranked = sorted(output['extracted_sections'], key=lambda s: s['importance_rank'])
+    return [section_key(s) for s in ranked[:k]]
+
+def reset_caches():
+    analyst.TOKEN_CACHE.clear()
+    analyst.CJK_LINE_CACHE.clear()
+
+def language_documents(collection_dir, lang_code):
+    """
+    PDFs listed in the collection's input file whose detected language is lang_code.
+    """
+    with open(os.path.join(collection_dir, "challenge1b_input.json"), 'r', encoding='utf-8') as f:
+        input_data = json.load(f)
+    pdf_paths = []
+    for doc_info in input_data.get("documents", []):
+        pdf_path = os.path.join(collection_dir, "PDFs", doc_info.get("filename", ""))
+        if not os.path.isfile(pdf_path):
+            print(f"Warning: PDF file not found: '{pdf_path}'. It will be skipped.", file=sys.stderr)
+            continue
+        blocks = analyst.extract_text_from_pdf(pdf_path)
+        if analyst.detect_document_language(blocks)[0] == lang_code:
+            pdf_paths.append(pdf_path)
+    return pdf_paths
+
+def run_mode(mode, pdf_paths, block_texts, lang_code, max_queries):
+    """
+    Tokenizes the documents and ranks every pseudo-query with one mode.
+    Returns the timing and the per-query outputs.
+    """
+    analyst.CJK_TOKENIZATION = mode
+    reset_caches()
+
+    start = time.perf_counter()
+    analyst.preprocess_texts(block_texts, [lang_code] * len(block_texts))
+    tokenize_seconds = time.perf_counter() - start
+
+    # Queries are the same for both modes: every section title, in document order
+    documents, _ = analyst.prepare_documents(pdf_paths)
+    sections = [section for _, doc_sections in documents for section in doc_sections]
+    sections = sections[:max_queries] if max_queries else sections
+    queries = [(section['section_title'], "") for section in sections]
+
+    start = time.perf_counter()
+    outputs = analyst.analyze_documents_batch(pdf_paths, queries)
+    rank_seconds = time.perf_counter() - start
+
+    return {
+        "tokenize_seconds": tokenize_seconds,
+        "rank_seconds": rank_seconds,
+        "sources": [section_key(section) for section in sections],
+        "outputs": outputs
+    }
+
+def compare(runs, k):
+    morph, ngram = runs['morph'], runs['ngram']
+    overlaps = []
+    for morph_output, ngram_output in zip(morph['outputs'], ngram['outputs']):
+        morph_top = top_sections(morph_output, k)
+        ngram_top = top_sections(ngram_output, k)
+        overlaps.append(len(set(morph_top) & set(ngram_top)) / max(len(morph_top), 1))
+
+    def success_at_1(run):
+        hits = sum(1 for source, output in zip(run['sources'], run['outputs'])
+                   if top_sections(output, 1) == [source])
+        return hits / max(len(run['sources']), 1)
+
+    return {
+        "queries": len(overlaps),
+        f"mean_top{k}_overlap": sum(overlaps) / max(len(overlaps), 1),
+        "morph_success_at_1": success_at_1(morph),
+        "ngram_success_at_1": success_at_1(ngram)
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark morphological vs n-gram CJK tokenization.")
+    parser.add_argument("--collection", default="Collection Multilingual")
+    parser.add_argument("--lang", default="ko", choices=analyst.CJK_LANGUAGES)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-queries", type=int, default=0, help="0 uses every section title")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    pdf_paths = language_documents(args.collection, args.lang)
+    if not pdf_paths:
+        print(f"No '{args.lang}' documents found in '{args.collection}'.", file=sys.stderr)
+        exit(1)
+
+    block_texts = [block['text'] for pdf_path in pdf_paths
+                   for block in analyst.extract_text_from_pdf(pdf_path)]
+    total_chars = sum(len(text) for text in block_texts)
+    # Loading the analyzer is a one-off cost, not part of the throughput
+    analyst.prewarm([args.lang])
+
+    runs = {mode: run_mode(mode, pdf_paths, block_texts, args.lang, args.max_queries)
+            for mode in ('morph', 'ngram')}
+
+    results = {
+        "documents": [os.path.basename(p) for p in pdf_paths],
+        "characters": total_chars,
+        "modes": {
+            mode: {
+                "tokenize_seconds": round(run['tokenize_seconds'], 3),
+                "chars_per_second": round(total_chars / run['tokenize_seconds']) if run['tokenize_seconds'] else None,
+                "rank_seconds": round(run['rank_seconds'], 3)
+            }
+            for mode, run in runs.items()
+        },
+        "agreement": compare(runs, args.top_k)
+    }
+    print(json.dumps(results, indent=4, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
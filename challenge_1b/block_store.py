@@ -0,0 +1,82 @@
+import json
+import zlib
+import time
+import sqlite3
+import hashlib
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_digest(path):
+    """
+    SHA-256 of a file's contents, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def config_fingerprint(config):
+    """
+    Short stable hash of a JSON-serializable configuration dictionary.
+    """
+    encoded = json.dumps(config, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+class BlockStore:
+    """
+    SQLite file holding the prepared sections of each PDF (segmented blocks,
+    titles, detected language and token streams), keyed by the PDF's content
+    hash and a fingerprint of the segmentation/tokenization configuration.
+    Entries are stored as zlib-compressed JSON.
+    """
+    def __init__(self, path, config):
+        self.path = path
+        self.fingerprint = config_fingerprint(config)
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sections ("
+            " digest TEXT NOT NULL,"
+            " config TEXT NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " created REAL NOT NULL,"
+            " PRIMARY KEY (digest, config))"
+        )
+        self.conn.commit()
+
+    def get(self, digest):
+        """
+        Returns the stored sections for a PDF digest, or None on a miss.
+        """
+        row = self.conn.execute(
+            "SELECT payload FROM sections WHERE digest = ? AND config = ?",
+            (digest, self.fingerprint)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def put(self, digest, sections):
+        payload = zlib.compress(json.dumps(sections, ensure_ascii=False).encode('utf-8'))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sections (digest, config, payload, created) VALUES (?, ?, ?, ?)",
+            (digest, self.fingerprint, payload, time.time())
+        )
+        self.conn.commit()
+
+    def prune_stale(self):
+        """
+        Deletes entries written under a different configuration.
+        """
+        deleted = self.conn.execute(
+            "DELETE FROM sections WHERE config != ?", (self.fingerprint,)
+        ).rowcount
+        self.conn.commit()
+        return deleted
+
+    def close(self):
+        self.conn.close()
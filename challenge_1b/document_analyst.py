@@ -1,399 +1,1375 @@
-import PyPDF2
-import os
-import json
-import re
-from datetime import datetime
-from collections import Counter
-from langdetect import detect, DetectorFactory
-import sys
-
-# Set a seed for langdetect for consistent results (optional, but good for reproducibility)
-DetectorFactory.seed = 0 
-
-# --- Configuration ---
-# Minimum length for a text block to be considered a significant 'section'
-MIN_SECTION_LENGTH = 50
-# Minimum length for a text block to be considered a 'sub-section' (e.g., a paragraph)
-MIN_SUBSECTION_LENGTH = 20
-# Maximum number of words for a line to be considered a potential section title
-MAX_TITLE_WORDS = 10
-
-# Global dictionary to store loaded stopwords for different languages
-LOADED_STOP_WORDS = {}
-
-# --- Multilingual NLP Components (Imported conditionally) ---
-try:
-    from janome.tokenizer import Tokenizer as JanomeTokenizer
-    JANOME_T = JanomeTokenizer()
-    JANOME_AVAILABLE = True
-except ImportError:
-    print("Warning: Janome not found. Japanese tokenization will be basic.", file=sys.stderr)
-    JANOME_AVAILABLE = False
-
-try:
-    from pecab import PeCab
-    PECAB_T = PeCab()
-    PECAB_AVAILABLE = True
-except ImportError:
-    print("Warning: Pecab not found. Korean tokenization will be basic.", file=sys.stderr)
-    PECAB_AVAILABLE = False
-
-def load_stopwords(lang_code, stopwords_dir="lang_data"):
-    """
-    Loads language-specific stopwords from a file.
-    Caches loaded stopwords to avoid re-reading files.
-    """
-    if lang_code in LOADED_STOP_WORDS:
-        return LOADED_STOP_WORDS[lang_code]
-
-    filepath = os.path.join(stopwords_dir, f"stopwords_{lang_code}.txt")
-    if not os.path.exists(filepath):
-        print(f"Warning: Stopwords file not found for {lang_code} at {filepath}. Continuing without stop words for this language.", file=sys.stderr)
-        return set()
-    
-    with open(filepath, 'r', encoding='utf-8') as f:
-        stopwords = set(f.read().splitlines())
-    
-    LOADED_STOP_WORDS[lang_code] = stopwords
-    return stopwords
-
-# --- Text Processing Utilities ---
-def multilingual_tokenize(text, lang_code):
-    """
-    Tokenizes text based on language.
-    """
-    if lang_code == 'ja' and JANOME_AVAILABLE:
-        # For Japanese, use Janome morphological analysis
-        return [token.surface for token in JANOME_T.tokenize(text)]
-    elif lang_code == 'ko' and PECAB_AVAILABLE:
-        # For Korean, use Pecab morphological analysis
-        return [token[0] for token in PECAB_T.morphs(text)]
-    else:
-        # Default to whitespace tokenization for other languages (e.g., en, fr, ro)
-        return text.split()
-
-def preprocess_text(text):
-    """
-    Cleans, tokenizes, and removes language-specific stop words from text.
-    Automatically detects language.
-    """
-    if not text.strip(): # Handle empty or whitespace-only text
-        return []
-
-    try:
-        lang_code = detect(text)
-    except Exception: # langdetect can fail for very short/ambiguous strings
-        lang_code = 'en' # Default to English if detection fails
-        # print(f"Warning: Language detection failed for '{text[:50]}...'. Defaulting to English.", file=sys.stderr)
-
-    stopwords = load_stopwords(lang_code)
-
-    # Replace common newline patterns with a single space for consistent tokenization
-    text = text.lower()
-    text = text.replace('\r\n', ' ').replace('\n', ' ')
-    
-    # --- ADDED: Robust handling of problematic Unicode characters ---
-    # This attempts to encode the text to UTF-8 and ignore any characters
-    # that cannot be encoded (like malformed surrogates), then decode it back.
-    # This strips out problematic Unicode sequences that cause encoding errors.
-    text = text.encode('utf-8', errors='ignore').decode('utf-8')
-
-    # Remove any character that is not a Unicode word character or whitespace.
-    # The re.UNICODE flag (re.U) makes \w (word character) and \s (whitespace) Unicode-aware.
-    # This should correctly preserve Japanese/Korean/Chinese characters as well as Latin alphabet and numbers.
-    text = re.sub(r'[^\w\s]', '', text, flags=re.UNICODE)
-
-    tokens = multilingual_tokenize(text, lang_code)
-    
-    # Filter out empty tokens and stopwords
-    return [word for word in tokens if word and word not in stopwords]
-
-def calculate_relevance_score(text_tokens, query_tokens):
-    """
-    Calculates a simple relevance score based on the overlap of keywords.
-    The score is the count of query tokens found in the text tokens, normalized
-    by the length of the text block.
-    """
-    if not text_tokens or not query_tokens:
-        return 0.0
-
-    score = 0
-    query_tokens_set = set(query_tokens)
-    
-    for token in text_tokens:
-        if token in query_tokens_set:
-            score += 1
-            
-    # Normalize the score by the number of tokens in the text block
-    normalized_score = score / (len(text_tokens) + 1e-6) # Add small epsilon to prevent division by zero
-    
-    return normalized_score
-
-# --- PDF Processing ---
-def extract_text_from_pdf(pdf_path):
-    """
-    Extracts text page by page from a PDF and attempts to segment it into
-    logical blocks (potential sections or paragraphs).
-    
-    Returns a list of dictionaries, where each dictionary represents a block of text
-    and includes its content, original page number, and a flag indicating if it's
-    a potential title.
-    """
-    extracted_data = []
-    try:
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            for page_num in range(len(reader.pages)):
-                page = reader.pages[page_num]
-                text = page.extract_text()
-                
-                # Split text into lines to look for potential titles and paragraph breaks
-                lines = text.split('\n')
-                
-                current_block_lines = []
-                for i, line in enumerate(lines):
-                    stripped_line = line.strip()
-                    
-                    # Heuristic to detect start of a new block or end of previous one.
-                    # Consider multiple blank lines as a separator for distinct blocks.
-                    # Also consider significant indentation changes or lines ending with specific punctuation
-                    # as both are heuristic for block boundaries, though keeping it simple for now.
-                    if not stripped_line and len(current_block_lines) > 0 and \
-                       (i + 1 < len(lines) and not lines[i+1].strip()): # Two consecutive blank lines
-                        block_text = "\n".join(current_block_lines).strip()
-                        if block_text:
-                            # Try to infer if the first line of the block is a title
-                            first_line_of_block = current_block_lines[0].strip()
-                            is_title_candidate = False
-                            if first_line_of_block and len(first_line_of_block.split()) <= MAX_TITLE_WORDS:
-                                is_title_candidate = True
-
-                            extracted_data.append({
-                                'text': block_text,
-                                'page_number': page_num + 1,
-                                'is_title_candidate': is_title_candidate,
-                                'original_line': first_line_of_block if is_title_candidate else ""
-                            })
-                        current_block_lines = []
-                        continue # Skip the blank line itself
-                    
-                    current_block_lines.append(line)
-                
-                # Add any remaining text in current_block_lines after the loop
-                if current_block_lines:
-                    block_text = "\n".join(current_block_lines).strip()
-                    if block_text:
-                        first_line_of_block = current_block_lines[0].strip()
-                        is_title_candidate = False
-                        if first_line_of_block and len(first_line_of_block.split()) <= MAX_TITLE_WORDS:
-                            is_title_candidate = True
-                        
-                        extracted_data.append({
-                            'text': block_text,
-                            'page_number': page_num + 1,
-                            'is_title_candidate': is_title_candidate,
-                            'original_line': first_line_of_block if is_title_candidate else ""
-                        })
-                
-    except Exception as e:
-        print(f"Error processing {pdf_path}: {e}", file=sys.stderr)
-    return extracted_data
-
-def analyze_documents(pdf_paths, persona, job_to_be_done):
-    """
-    Main function to orchestrate document analysis. It extracts content,
-    calculates relevance, ranks sections, and formats the output as JSON.
-    """
-    processing_timestamp = datetime.now().isoformat()
-    
-    # Combine persona and job for query keywords, preprocess them multilingually
-    query_text = f"{persona} {job_to_be_done}"
-    query_tokens = preprocess_text(query_text)
-
-    all_sections_data = [] # To hold data for 'extracted_sections'
-    all_sub_sections_data = [] # To hold data for 'sub_section_analysis'
-
-    for pdf_path in pdf_paths:
-        document_name = os.path.basename(pdf_path)
-        extracted_blocks = extract_text_from_pdf(pdf_path)
-        
-        document_sections_candidates = []
-
-        # Step 1: Identify and rank potential sections from extracted blocks
-        for i, block in enumerate(extracted_blocks):
-            block_text = block['text']
-            block_page = block['page_number']
-            
-            # Skip blocks that are too short to be meaningful sections
-            if len(block_text) < MIN_SECTION_LENGTH:
-                continue
-            
-            block_tokens = preprocess_text(block_text)
-            relevance_score = calculate_relevance_score(block_tokens, query_tokens)
-            
-            # Determine section title based on heuristics or default
-            section_title = f"Content Block {i+1} (Page {block_page})" 
-            if block['is_title_candidate'] and block['original_line']:
-                section_title = block['original_line']
-            elif len(block_text.split('\n')[0].split()) <= MAX_TITLE_WORDS:
-                 # If the first line of the block is short, use it as a title
-                 section_title = block_text.split('\n')[0].strip()
-            
-            document_sections_candidates.append({
-                "document": document_name,
-                "page_number": block_page,
-                "section_title": section_title,
-                "relevance_score": relevance_score, # Temporarily store for sorting
-                "full_text": block_text # Keep full text for sub-section analysis
-            })
-            
-        # Sort candidate sections by relevance score in descending order
-        document_sections_candidates.sort(key=lambda x: x['relevance_score'], reverse=True)
-        
-        # Assign importance_rank and prepare for final output
-        for rank, section in enumerate(document_sections_candidates):
-            all_sections_data.append({
-                "document": section['document'],
-                "page_number": section['page_number'],
-                "section_title": section['section_title'],
-                "importance_rank": rank + 1 # Ranks start from 1
-            })
-            
-            # Step 2: Sub-section analysis for a limited number of top relevant sections
-            # This balances detailed analysis with performance constraints.
-            if rank < 5: # Process top 5 most relevant sections for sub-sections
-                full_section_text = section['full_text']
-                section_page = section['page_number']
-                
-                # Split the full section text into individual paragraphs or smaller chunks
-                # assuming paragraphs are separated by two or more newlines.
-                paragraphs = [p.strip() for p in full_section_text.split('\n\n') if p.strip()]
-                
-                for p_idx, paragraph in enumerate(paragraphs):
-                    if len(paragraph) < MIN_SUBSECTION_LENGTH: # Skip very short paragraphs
-                        continue
-                        
-                    paragraph_tokens = preprocess_text(paragraph)
-                    sub_relevance_score = calculate_relevance_score(paragraph_tokens, query_tokens)
-                    
-                    if sub_relevance_score > 0.0: # Only include sub-sections that show some relevance
-                        all_sub_sections_data.append({
-                            "document": document_name,
-                            "refined_text": paragraph,
-                            # Outputting just page_number for simplicity as per user's earlier example
-                            "page_number": section_page, 
-                            "relevance_score": sub_relevance_score # Temporarily store for sorting
-                        })
-    
-    # Sort all identified sub-sections by their relevance score globally
-    all_sub_sections_data.sort(key=lambda x: x['relevance_score'], reverse=True)
-    
-    # Clean up temporary fields before final JSON output
-    final_extracted_sections = []
-    for sec in all_sections_data:
-        # Create a new dictionary to avoid modifying the original during iteration
-        temp_sec = {k: v for k, v in sec.items() if k not in ['relevance_score', 'full_text']}
-        final_extracted_sections.append(temp_sec)
-
-    final_sub_section_analysis = []
-    for sub_sec in all_sub_sections_data:
-        temp_sub_sec = {k: v for k, v in sub_sec.items() if k != 'relevance_score'}
-        final_sub_section_analysis.append(temp_sub_sec)
-
-    # Construct the final JSON output structure
-    output_json = {
-        "metadata": {
-            "input_documents": [os.path.basename(p) for p in pdf_paths],
-            "persona": persona,
-            "job_to_be_done": job_to_be_done,
-            "processing_timestamp": processing_timestamp
-        },
-        "extracted_sections": final_extracted_sections,
-        "sub_section_analysis": final_sub_section_analysis
-    }
-
-    return output_json
-
-# --- Main Execution Block ---
-if __name__ == "__main__":
-    # Define input and output directories.
-    # Docker mounts the local collection folder to /app/input
-    input_dir = os.getenv('INPUT_DIR', '/app/input') 
-    # Output is written back to the same mounted input folder as per hackathon standard
-    output_dir = os.getenv('OUTPUT_DIR', '/app/input') 
-
-    # Ensure the output directory exists. (It's the mounted input dir, so it should exist)
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Path to the input JSON file (expected directly in the mounted input directory)
-    input_json_filename = "challenge1b_input.json" 
-    input_json_path = os.path.join(input_dir, input_json_filename)
-
-    # Check if input.json exists
-    if not os.path.exists(input_json_path):
-        print(f"Error: {input_json_filename} not found in '{input_dir}'.", file=sys.stderr)
-        print(f"Please ensure '{input_json_filename}' is present in the mounted input directory.", file=sys.stderr)
-        exit(1)
-
-    # Load input data from challenge1b_input.json
-    try:
-        with open(input_json_path, 'r', encoding='utf-8') as f:
-            input_data = json.load(f)
-        
-        # Extract persona and job-to-be-done
-        persona_role = input_data.get("persona", {}).get("role", "Unknown Persona")
-        job_task = input_data.get("job_to_be_done", {}).get("task", "Unknown Task")
-
-        # Construct list of PDF paths from the 'documents' array in input.json
-        pdf_files_info = input_data.get("documents", [])
-        pdf_paths = []
-        # PDFs are expected in a 'PDFs' subfolder within the mounted input directory
-        pdf_subfolder = os.path.join(input_dir, "PDFs") 
-
-        if not os.path.exists(pdf_subfolder):
-            print(f"Error: 'PDFs' subfolder not found in '{input_dir}'.", file=sys.stderr)
-            print("Please ensure your PDF documents are placed in an 'PDFs' subfolder within the mounted input directory.", file=sys.stderr)
-            exit(1)
-
-        for doc_info in pdf_files_info:
-            filename = doc_info.get("filename")
-            if filename:
-                full_pdf_path = os.path.join(pdf_subfolder, filename)
-                if os.path.exists(full_pdf_path):
-                    pdf_paths.append(full_pdf_path)
-                else:
-                    print(f"Warning: PDF file not found: '{full_pdf_path}'. It will be skipped.", file=sys.stderr)
-            else:
-                print(f"Warning: Document entry missing 'filename' in {input_json_filename}: {doc_info}", file=sys.stderr)
-
-        if not pdf_paths:
-            print(f"No valid PDF files found or specified in '{input_json_path}'. No analysis will be performed.", file=sys.stderr)
-            exit(1)
-
-        print(f"Found {len(pdf_paths)} PDF(s) to process based on {input_json_filename} in '{input_dir}'.")
-        print(f"Persona: '{persona_role}'")
-        print(f"Job to be done: '{job_task}'")
-        
-        # Call the main analysis function
-        output_data = analyze_documents(pdf_paths, persona_role, job_task)
-        
-        # Define the output file path as specified by the hackathon (challenge1b_output.json)
-        # It's written to the same mounted directory (e.g., Collection X folder)
-        output_file_path = os.path.join(output_dir, "challenge1b_output.json")
-        
-        # Write the JSON output to the specified file
-        with open(output_file_path, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=4, ensure_ascii=False) # Use ensure_ascii=False for proper multilingual JSON output
-        
-        print(f"Analysis complete. Output saved to '{output_file_path}'.")
-
-    except json.JSONDecodeError as e:
-        print(f"Error decoding {input_json_filename}: {e}", file=sys.stderr)
-        print(f"Please ensure '{input_json_filename}' is a valid JSON file.", file=sys.stderr)
-        exit(1)
-    except Exception as e:
-        print(f"An unexpected error occurred during processing: {e}", file=sys.stderr)
-        import traceback
-        traceback.print_exc(file=sys.stderr)
-        exit(1)
-
+import PyPDF2
+import os
+import json
+import re
+import hashlib
+import importlib.util
+import multiprocessing
+import tempfile
+from datetime import datetime
+from collections import Counter, OrderedDict, deque
+from langdetect import detect, detect_langs, DetectorFactory
+from langdetect.detector_factory import init_factory
+import sys
+
+import pipeline_metrics
+from pipeline_metrics import stage
+from block_store import BlockStore, file_digest
+from retrieval import BM25Index, TopK, score_matrix
+from near_duplicates import NearDuplicateIndex
+
+# Set a seed for langdetect for consistent results (optional, but good for reproducibility)
+DetectorFactory.seed = 0 
+
+# --- Configuration ---
+# Minimum length for a text block to be considered a significant 'section'
+MIN_SECTION_LENGTH = 50
+# Minimum length for a text block to be considered a 'sub-section' (e.g., a paragraph)
+MIN_SUBSECTION_LENGTH = 20
+# Maximum number of words for a line to be considered a potential section title
+MAX_TITLE_WORDS = 10
+# Number of blocks sampled from each document to detect its language
+LANG_SAMPLE_BLOCKS = 5
+# Below this probability the document language is not trusted and each block is detected on its own
+LANG_CONFIDENCE_THRESHOLD = 0.90
+# Maximum number of token lists kept in the tokenization cache
+TOKEN_CACHE_SIZE = 4096
+# Japanese/Korean tokenization: 'morph' (Janome/PeCab morphological analysis)
+# or 'ngram' (character n-grams, no analyzer; much faster, less precise)
+CJK_TOKENIZATION = 'morph'
+# Character n-gram sizes used by the 'ngram' mode
+CJK_NGRAM_SIZES = (2,)
+# Maximum number of tokenized CJK lines kept for reuse across blocks and documents
+CJK_LINE_CACHE_SIZE = 16384
+# Relevance scoring used when ranking sections: 'overlap' or 'bm25'
+SCORING_METHOD = 'overlap'
+# Worker processes used to extract and tokenize documents (1 = in-process)
+PREPARE_WORKERS = 1
+# Number of top sections per document whose paragraphs are analyzed as sub-sections
+SUBSECTION_SOURCE_SECTIONS = 5
+# Group near-duplicate blocks across the collection (MinHash over character
+# shingles) and tokenize, score and rank one representative per group
+DEDUP_BLOCKS = False
+# Estimated Jaccard similarity from which two blocks count as near-duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Document models written by challenge_1a (process_pdfs.py --document-dir);
+# must match DOCUMENT_MODEL_VERSION/SUFFIX in challenge_1a/document_model.py,
+# which benchmark.py checks
+DOCUMENT_MODEL_VERSION = 1
+DOCUMENT_MODEL_SUFFIX = ".document.json"
+# "params" of a document model: the fingerprint of challenge_1a's extraction settings
+DOCUMENT_MODEL_PARAMS_PATTERN = re.compile(r'[0-9a-f]{16}')
+# Bump when block segmentation or tokenization changes in a way the settings
+# above do not capture; the persistent block store is keyed on it.
+SEGMENTATION_VERSION = 5
+
+# Global dictionary to store loaded stopwords for different languages
+LOADED_STOP_WORDS = {}
+
+# Languages tokenized line by line through tokenize_cjk_lines
+CJK_LANGUAGES = ('ja', 'ko')
+# Hiragana, Katakana, Hangul and CJK ideographs
+CJK_CHAR_PATTERN = re.compile(r'[\u1100-\u11ff\u3040-\u30ff\u3130-\u318f\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]')
+
+# --- Multilingual NLP Components (Loaded on first use) ---
+# Only check that the packages are installed here. Importing them and
+# building the tokenizers (Janome's dictionary, PeCab's model) is deferred
+# until a Japanese or Korean text is tokenized, so Latin-script collections
+# never pay for it.
+JANOME_AVAILABLE = importlib.util.find_spec("janome") is not None
+if not JANOME_AVAILABLE:
+    print("Warning: Janome not found. Japanese tokenization will be basic.", file=sys.stderr)
+
+PECAB_AVAILABLE = importlib.util.find_spec("pecab") is not None
+if not PECAB_AVAILABLE:
+    print("Warning: Pecab not found. Korean tokenization will be basic.", file=sys.stderr)
+
+# Tokenizer instances, keyed by language code, kept for the life of the process
+LOADED_TOKENIZERS = {}
+
+def get_tokenizer(lang_code):
+    """
+    Returns the morphological tokenizer for 'ja' or 'ko', loading it the
+    first time it is needed. Returns None when no tokenizer is available,
+    in which case callers fall back to whitespace tokenization.
+    """
+    global JANOME_AVAILABLE, PECAB_AVAILABLE
+    if lang_code in LOADED_TOKENIZERS:
+        return LOADED_TOKENIZERS[lang_code]
+
+    tokenizer = None
+    if lang_code == 'ja' and JANOME_AVAILABLE:
+        try:
+            from janome.tokenizer import Tokenizer as JanomeTokenizer
+            tokenizer = JanomeTokenizer()
+        except ImportError as e:
+            print(f"Warning: Janome could not be loaded ({e}). Japanese tokenization will be basic.", file=sys.stderr)
+            JANOME_AVAILABLE = False
+    elif lang_code == 'ko' and PECAB_AVAILABLE:
+        try:
+            from pecab import PeCab
+            tokenizer = PeCab()
+        except ImportError as e:
+            print(f"Warning: Pecab could not be loaded ({e}). Korean tokenization will be basic.", file=sys.stderr)
+            PECAB_AVAILABLE = False
+    else:
+        return None
+
+    LOADED_TOKENIZERS[lang_code] = tokenizer
+    return tokenizer
+
+def prewarm(languages=('ja', 'ko'), stopwords_dir="lang_data"):
+    """
+    Loads the language detection profiles, the tokenizers and the stopwords
+    of the given languages up front. Long-lived processes call this once at
+    startup; worker pools created afterwards start from a forked copy of the
+    loaded models instead of loading them again.
+    """
+    init_factory()
+    for lang_code in languages:
+        get_tokenizer(lang_code)
+        load_stopwords(lang_code, stopwords_dir)
+
+def load_stopwords(lang_code, stopwords_dir="lang_data"):
+    """
+    Loads language-specific stopwords from a file.
+    Caches loaded stopwords to avoid re-reading files.
+    """
+    if lang_code in LOADED_STOP_WORDS:
+        return LOADED_STOP_WORDS[lang_code]
+
+    filepath = os.path.join(stopwords_dir, f"stopwords_{lang_code}.txt")
+    if not os.path.exists(filepath):
+        print(f"Warning: Stopwords file not found for {lang_code} at {filepath}. Continuing without stop words for this language.", file=sys.stderr)
+        return set()
+    
+    with open(filepath, 'r', encoding='utf-8') as f:
+        stopwords = set(f.read().splitlines())
+    
+    LOADED_STOP_WORDS[lang_code] = stopwords
+    return stopwords
+
+# --- Text Processing Utilities ---
+def multilingual_tokenize(text, lang_code):
+    """
+    Tokenizes text based on language.
+    """
+    tokenizer = get_tokenizer(lang_code)
+    if lang_code == 'ja' and tokenizer is not None:
+        # For Japanese, use Janome morphological analysis
+        return [token.surface for token in tokenizer.tokenize(text)]
+    elif lang_code == 'ko' and tokenizer is not None:
+        # For Korean, use Pecab morphological analysis
+        return tokenizer.morphs(text)
+    else:
+        # Default to whitespace tokenization for other languages (e.g., en, fr, ro)
+        return text.split()
+
+class TokenCache:
+    """
+    Small LRU cache of token lists keyed by a hash of the source text and its
+    language. Repeated text (single-paragraph blocks, headers, the query)
+    is only cleaned and tokenized once. Hits and misses are counted as
+    '<name>_hits' and '<name>_misses' in the pipeline metrics, which also
+    collects them from worker processes.
+    """
+    def __init__(self, maxsize, name):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hit_counter = f"{name}_hits"
+        self.miss_counter = f"{name}_misses"
+
+    def get(self, key):
+        tokens = self.entries.get(key)
+        if tokens is None:
+            pipeline_metrics.count(self.miss_counter)
+            return None
+        self.entries.move_to_end(key)
+        pipeline_metrics.count(self.hit_counter)
+        return tokens
+
+    def put(self, key, tokens):
+        self.entries[key] = tokens
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+TOKEN_CACHE = TokenCache(TOKEN_CACHE_SIZE, 'token_cache')
+# Tokens of single cleaned CJK lines; repeated headers, footers and
+# boilerplate are analyzed once per process
+CJK_LINE_CACHE = TokenCache(CJK_LINE_CACHE_SIZE, 'cjk_line_cache')
+
+def cjk_ngrams(line):
+    """
+    Fast-mode tokenization of one cleaned line: words containing CJK
+    characters become overlapping character n-grams (CJK_NGRAM_SIZES),
+    other words are kept whole.
+    """
+    tokens = []
+    for word in line.split():
+        if not CJK_CHAR_PATTERN.search(word):
+            tokens.append(word)
+            continue
+        if len(word) < min(CJK_NGRAM_SIZES):
+            tokens.append(word)
+            continue
+        for n in CJK_NGRAM_SIZES:
+            tokens.extend(word[i:i + n] for i in range(len(word) - n + 1))
+    return tokens
+
+def _morph_lines(lines, lang_code):
+    """
+    Runs the morphological analyzer over cleaned lines and returns one token
+    list per line. Each line is analyzed on its own, so its tokens never
+    depend on the lines around it and can be cached per line: PeCab's cost
+    grows faster than linearly with input length, and Janome splits long
+    input at arbitrary points (its MAX_CHUNK_SIZE) and analyzes words
+    differently at a line break than at the end of the text.
+    """
+    tokenizer = get_tokenizer(lang_code)
+    if tokenizer is None:
+        return [line.split() for line in lines]
+    if lang_code == 'ko':
+        return [tokenizer.morphs(line) for line in lines]
+    return [[token.surface for token in tokenizer.tokenize(line)] for line in lines]
+
+def tokenize_cjk_lines(lines, lang_code):
+    """
+    Tokenizes cleaned Japanese or Korean lines in one batch. Lines already
+    seen (in this batch, earlier blocks or other documents) come from
+    CJK_LINE_CACHE; only the remaining unique lines reach the analyzer.
+    Returns one token list per input line.
+    """
+    keys = [(line, lang_code, CJK_TOKENIZATION) for line in lines]
+    results = {}
+    missing = []
+    for key, line in zip(keys, lines):
+        if key in results:
+            continue
+        tokens = CJK_LINE_CACHE.get(key)
+        results[key] = tokens
+        if tokens is None:
+            missing.append(line)
+
+    pipeline_metrics.count('cjk_lines', len(lines))
+    pipeline_metrics.count('cjk_lines_analyzed', len(missing))
+    if missing:
+        with stage('cjk_tokenize'):
+            if CJK_TOKENIZATION == 'ngram':
+                token_lists = [cjk_ngrams(line) for line in missing]
+            else:
+                token_lists = _morph_lines(missing, lang_code)
+        for line, tokens in zip(missing, token_lists):
+            # Whitespace is a token for Janome; it carries no meaning here
+            tokens = [token for token in tokens if token.strip()]
+            key = (line, lang_code, CJK_TOKENIZATION)
+            results[key] = tokens
+            CJK_LINE_CACHE.put(key, tokens)
+
+    return [results[key] for key in keys]
+
+def detect_language(text):
+    """
+    Detects the language of a single piece of text, defaulting to English.
+    """
+    try:
+        return detect(text)
+    except Exception: # langdetect can fail for very short/ambiguous strings
+        return 'en' # Default to English if detection fails
+
+def detect_document_language(blocks):
+    """
+    Detects a document's language once from a sample of its blocks.
+    Returns the language code and langdetect's probability for it.
+    """
+    samples = [b['text'] for b in blocks if len(b['text']) >= MIN_SECTION_LENGTH]
+    if not samples:
+        samples = [b['text'] for b in blocks if b['text'].strip()]
+    if not samples:
+        return 'en', 0.0
+
+    # Spread the sample over the whole document rather than its first pages
+    step = max(1, len(samples) // LANG_SAMPLE_BLOCKS)
+    sample_text = "\n".join(samples[::step][:LANG_SAMPLE_BLOCKS])
+    try:
+        best = detect_langs(sample_text)[0]
+        return best.lang, best.prob
+    except Exception:
+        return 'en', 0.0
+
+def _token_cache_key(text, lang_code):
+    mode = CJK_TOKENIZATION if lang_code in CJK_LANGUAGES else None
+    return (hashlib.blake2b(text.encode('utf-8', errors='surrogatepass'), digest_size=16).digest(), lang_code, mode)
+
+def preprocess_text(text, lang_code=None):
+    """
+    Cleans, tokenizes, and removes language-specific stop words from text.
+    Detects the language when lang_code is not given. Results are memoized,
+    so the returned list must not be modified by callers.
+    """
+    if not text.strip(): # Handle empty or whitespace-only text
+        return []
+
+    if lang_code is None:
+        lang_code = detect_language(text)
+
+    cache_key = _token_cache_key(text, lang_code)
+    tokens = TOKEN_CACHE.get(cache_key)
+    if tokens is None:
+        tokens = _clean_and_tokenize(text, lang_code)
+        TOKEN_CACHE.put(cache_key, tokens)
+    return tokens
+
+def preprocess_texts(texts, lang_codes):
+    """
+    Batch form of preprocess_text for texts whose languages are known.
+    Japanese and Korean texts of the batch are split into lines and
+    tokenized together, so lines shared between texts are analyzed once.
+    """
+    results = [None] * len(texts)
+    cjk_pending = {} # lang_code -> [(index, cache key)]
+    for i, (text, lang_code) in enumerate(zip(texts, lang_codes)):
+        if not text.strip():
+            results[i] = []
+            continue
+        cache_key = _token_cache_key(text, lang_code)
+        tokens = TOKEN_CACHE.get(cache_key)
+        if tokens is not None:
+            results[i] = tokens
+        elif lang_code in CJK_LANGUAGES:
+            cjk_pending.setdefault(lang_code, []).append((i, cache_key))
+        else:
+            results[i] = _clean_and_tokenize(text, lang_code)
+            TOKEN_CACHE.put(cache_key, results[i])
+
+    for lang_code, pending in cjk_pending.items():
+        token_lists = _tokenize_cjk_texts([texts[i] for i, _ in pending], lang_code)
+        for (i, cache_key), tokens in zip(pending, token_lists):
+            results[i] = tokens
+            TOKEN_CACHE.put(cache_key, tokens)
+    return results
+
+def _tokenize_cjk_texts(texts, lang_code):
+    """
+    Cleans Japanese or Korean texts, tokenizes all their lines in one
+    tokenize_cjk_lines batch and removes stop words. Uncached.
+    """
+    line_lists = [[line.strip() for line in _clean_text(text).split('\n') if line.strip()] for text in texts]
+    line_tokens = iter(tokenize_cjk_lines([line for lines in line_lists for line in lines], lang_code))
+    stopwords = load_stopwords(lang_code)
+    return [[word for _ in lines for word in next(line_tokens) if word not in stopwords] for lines in line_lists]
+
+def _clean_text(text):
+    """
+    Lowercases text and strips everything but word characters and
+    whitespace. Line breaks are kept, normalized to '\\n'.
+    """
+    text = text.lower()
+    text = text.replace('\r\n', '\n')
+    
+    # --- ADDED: Robust handling of problematic Unicode characters ---
+    # This attempts to encode the text to UTF-8 and ignore any characters
+    # that cannot be encoded (like malformed surrogates), then decode it back.
+    # This strips out problematic Unicode sequences that cause encoding errors.
+    text = text.encode('utf-8', errors='ignore').decode('utf-8')
+
+    # Remove any character that is not a Unicode word character or whitespace.
+    # The re.UNICODE flag (re.U) makes \w (word character) and \s (whitespace) Unicode-aware.
+    # This should correctly preserve Japanese/Korean/Chinese characters as well as Latin alphabet and numbers.
+    return re.sub(r'[^\w\s]', '', text, flags=re.UNICODE)
+
+def _clean_and_tokenize(text, lang_code):
+    """
+    Uncached body of preprocess_text for a known language.
+    """
+    if lang_code in CJK_LANGUAGES:
+        return _tokenize_cjk_texts([text], lang_code)[0]
+
+    stopwords = load_stopwords(lang_code)
+
+    # Replace common newline patterns with a single space for consistent tokenization
+    text = _clean_text(text).replace('\n', ' ')
+
+    tokens = multilingual_tokenize(text, lang_code)
+    
+    # Filter out empty tokens and stopwords
+    return [word for word in tokens if word and word not in stopwords]
+
+def calculate_relevance_score(text_tokens, query_tokens):
+    """
+    Calculates a simple relevance score based on the overlap of keywords.
+    The score is the count of query tokens found in the text tokens, normalized
+    by the length of the text block.
+    """
+    if not text_tokens or not query_tokens:
+        return 0.0
+
+    score = 0
+    query_tokens_set = set(query_tokens)
+    
+    for token in text_tokens:
+        if token in query_tokens_set:
+            score += 1
+            
+    # Normalize the score by the number of tokens in the text block
+    normalized_score = score / (len(text_tokens) + 1e-6) # Add small epsilon to prevent division by zero
+    
+    return normalized_score
+
+# --- PDF Processing ---
+def extract_text_from_pdf(pdf_path, errors=None):
+    """
+    Extracts text page by page from a PDF and attempts to segment it into
+    logical blocks (potential sections or paragraphs).
+    
+    Returns a list of dictionaries, where each dictionary represents a block of text
+    and includes its content, original page number, and a flag indicating if it's
+    a potential title.
+
+    If parsing fails part-way, the blocks read so far are returned. The error
+    is appended to errors when a list is given, and printed otherwise.
+    """
+    return list(iter_pdf_blocks(pdf_path, errors))
+
+def iter_pdf_blocks(pdf_path, errors=None):
+    """
+    Generator form of extract_text_from_pdf: yields each block as soon as
+    its page has been read, without holding the blocks of the whole PDF.
+    """
+    try:
+        with open(pdf_path, 'rb') as file:
+            with stage('open'):
+                reader = PyPDF2.PdfReader(file)
+                page_count = len(reader.pages)
+            for page_num in range(page_count):
+                with stage('extract_page', page_num + 1):
+                    page = reader.pages[page_num]
+                    text = page.extract_text()
+                pipeline_metrics.count('pages')
+                
+                # Split text into lines to look for potential titles and paragraph breaks
+                lines = text.split('\n')
+                
+                current_block_lines = []
+                for i, line in enumerate(lines):
+                    stripped_line = line.strip()
+                    
+                    # Heuristic to detect start of a new block or end of previous one.
+                    # Consider multiple blank lines as a separator for distinct blocks.
+                    # Also consider significant indentation changes or lines ending with specific punctuation
+                    # as both are heuristic for block boundaries, though keeping it simple for now.
+                    if not stripped_line and len(current_block_lines) > 0 and \
+                       (i + 1 < len(lines) and not lines[i+1].strip()): # Two consecutive blank lines
+                        block_text = "\n".join(current_block_lines).strip()
+                        if block_text:
+                            # Try to infer if the first line of the block is a title
+                            first_line_of_block = current_block_lines[0].strip()
+                            is_title_candidate = False
+                            if first_line_of_block and len(first_line_of_block.split()) <= MAX_TITLE_WORDS:
+                                is_title_candidate = True
+
+                            yield {
+                                'text': block_text,
+                                'page_number': page_num + 1,
+                                'is_title_candidate': is_title_candidate,
+                                'original_line': first_line_of_block if is_title_candidate else ""
+                            }
+                        current_block_lines = []
+                        continue # Skip the blank line itself
+                    
+                    current_block_lines.append(line)
+                
+                # Add any remaining text in current_block_lines after the loop
+                if current_block_lines:
+                    block_text = "\n".join(current_block_lines).strip()
+                    if block_text:
+                        first_line_of_block = current_block_lines[0].strip()
+                        is_title_candidate = False
+                        if first_line_of_block and len(first_line_of_block.split()) <= MAX_TITLE_WORDS:
+                            is_title_candidate = True
+                        
+                        yield {
+                            'text': block_text,
+                            'page_number': page_num + 1,
+                            'is_title_candidate': is_title_candidate,
+                            'original_line': first_line_of_block if is_title_candidate else ""
+                        }
+                
+    except Exception as e:
+        if errors is None:
+            print(f"Error processing {pdf_path}: {e}", file=sys.stderr)
+        else:
+            errors.append(f"{type(e).__name__}: {e}")
+
+def document_model_path(document_dir, pdf_path):
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(document_dir, stem + DOCUMENT_MODEL_SUFFIX)
+
+def read_document_model(document_dir, pdf_path):
+    """
+    Returns the raw contents of the document model challenge_1a wrote for
+    this PDF, or None when there is none.
+    """
+    try:
+        with open(document_model_path(document_dir, pdf_path), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def parse_document_model(data, digest):
+    """
+    Parses a document model read by read_document_model, or returns None
+    when it is invalid or belongs to other file contents or another model
+    version. Models of any extraction settings are accepted, but they must
+    record them: "params" has to be a settings fingerprint.
+    """
+    try:
+        model = json.loads(data)
+    except ValueError:
+        return None
+    if not isinstance(model, dict):
+        return None
+    if model.get('version') != DOCUMENT_MODEL_VERSION or model.get('digest') != digest:
+        return None
+    params = model.get('params')
+    if not isinstance(params, str) or not DOCUMENT_MODEL_PARAMS_PATTERN.fullmatch(params):
+        return None
+    return model
+
+def blocks_from_document_model(model):
+    """
+    Turns the heading-bounded sections of a document model into the block
+    dictionaries extract_text_from_pdf returns. A section's heading, as found
+    by the outline stage, becomes its title; text before the first heading
+    goes through the usual first-line title heuristics.
+    """
+    blocks = []
+    for section in model.get('sections', []):
+        block_text = section['text'].strip()
+        if not block_text:
+            continue
+        title = section.get('title') or ""
+        blocks.append({
+            'text': block_text,
+            'page_number': section['page'],
+            'is_title_candidate': bool(title),
+            'original_line': title
+        })
+    return blocks
+
+def segmentation_config(stopwords_dir="lang_data", document_models=False):
+    """
+    Everything that influences prepare_sections' output for a given PDF.
+    Used to key the persistent block store.
+    """
+    stopwords_digest = hashlib.sha256()
+    if os.path.isdir(stopwords_dir):
+        for filename in sorted(os.listdir(stopwords_dir)):
+            with open(os.path.join(stopwords_dir, filename), 'rb') as f:
+                stopwords_digest.update(filename.encode('utf-8') + f.read())
+
+    return {
+        "version": SEGMENTATION_VERSION,
+        "min_section_length": MIN_SECTION_LENGTH,
+        "max_title_words": MAX_TITLE_WORDS,
+        "lang_sample_blocks": LANG_SAMPLE_BLOCKS,
+        "lang_confidence_threshold": LANG_CONFIDENCE_THRESHOLD,
+        "janome": JANOME_AVAILABLE,
+        "pecab": PECAB_AVAILABLE,
+        "cjk_tokenization": CJK_TOKENIZATION,
+        "cjk_ngram_sizes": list(CJK_NGRAM_SIZES),
+        "document_models": DOCUMENT_MODEL_VERSION if document_models else None,
+        "stopwords": stopwords_digest.hexdigest()
+    }
+
+def prepare_sections(pdf_path, store=None):
+    """
+    Extracts a PDF's blocks and turns every block long enough to be a section
+    into a candidate dictionary with its title, language and tokens.
+    Relevance is scored separately, once all documents are prepared.
+
+    With a BlockStore, sections of a PDF whose content was prepared before
+    are loaded from it and the PDF is neither parsed nor tokenized.
+    """
+    documents, _ = prepare_documents([pdf_path], store, workers=1)
+    return documents[0][1]
+
+def _stored_sections(store, digest, document_name):
+    """
+    Loads a document's prepared sections from the block store, or None.
+    """
+    cached_sections = store.get(digest)
+    if cached_sections is not None:
+        for section in cached_sections:
+            # The same content may be stored under another file name
+            section['document'] = document_name
+        _seed_token_cache(cached_sections)
+    return cached_sections
+
+def _seed_token_cache(sections):
+    # Let single-paragraph blocks reuse their tokens in sub-section analysis
+    for section in sections:
+        TOKEN_CACHE.put(_token_cache_key(section['full_text'], section['lang']), section['tokens'])
+
+def _prepare_document(pdf_path, model=None, tokenize=True):
+    """
+    Pool task: prepares one document in a worker process. Each worker imports
+    this module and so holds its own tokenizer instances and caches.
+    Returns (sections, errors).
+    """
+    errors = []
+    document_name = os.path.basename(pdf_path)
+    with pipeline_metrics.document(document_name):
+        sections = _prepare_sections(pdf_path, document_name, errors, model, tokenize)
+    return sections, errors
+
+def prepare_documents(pdf_paths, store=None, workers=PREPARE_WORKERS, document_dir=None, tokenize=True):
+    """
+    Prepares the sections of every document, in the order of pdf_paths.
+    Returns (documents, failures), where documents is a list of
+    (document name, sections) and failures lists {"document", "error"} for
+    every document that could not be fully parsed. The arguments are
+    described in iter_prepared_documents, which this collects.
+    """
+    documents = []
+    failures = []
+    for document_name, sections, document_failures in iter_prepared_documents(
+            pdf_paths, store, workers, document_dir, tokenize):
+        documents.append((document_name, sections))
+        failures.extend(document_failures)
+    return documents, failures
+
+def iter_prepared_documents(pdf_paths, store=None, workers=PREPARE_WORKERS, document_dir=None, tokenize=True):
+    """
+    Yields (document name, sections, failures) for every document, in the
+    order of pdf_paths, where failures lists {"document", "error"} if the
+    document could not be fully parsed.
+
+    Documents are looked up and prepared only a few ahead of the one being
+    yielded (two per worker), so a caller that consumes them one at a time
+    never holds the sections of the whole collection. With workers > 1,
+    documents that are not in the block store are extracted and tokenized
+    in a process pool. Block store lookups and writes stay in this process.
+
+    With a document_dir, sections come from the document models challenge_1a
+    saved there instead of a second parse of the PDF. Their sections are
+    stored under the digests of both the PDF and the model, so a model that
+    challenge_1a rewrites is picked up. PDFs without a usable model are
+    extracted with PyPDF2 as usual and not kept in the block store, so a
+    model written later is picked up too.
+
+    With tokenize=False, documents missing from the block store are only
+    extracted and segmented: their sections have 'tokens' set to None and
+    are not stored (see deduplicate_sections).
+    """
+    use_pool = workers > 1 and len(pdf_paths) > 1
+    measured = pipeline_metrics.METRICS is not None
+    window = 2 * workers if use_pool else 0
+    pool = None
+    pending = deque()
+
+    def finish(document_name, store_key, task, result):
+        if task is None:
+            return document_name, result, []
+        if not use_pool:
+            sections, errors = _prepare_document(*task)
+        elif measured:
+            # Workers return their stage timings along with the sections
+            (sections, errors), snapshot = result.get()
+            pipeline_metrics.METRICS.merge(snapshot)
+        else:
+            sections, errors = result.get()
+        pdf_path, model, _ = task
+        for error in errors:
+            print(f"Error processing {pdf_path}: {error}", file=sys.stderr)
+        if use_pool and tokenize:
+            # Sections tokenized in a worker are not in this process' cache
+            _seed_token_cache(sections)
+        from_model = document_dir is None or model is not None
+        if store is not None and sections and not errors and from_model and tokenize:
+            with stage('block_store'):
+                store.put(store_key, sections)
+        return document_name, sections, [{"document": document_name, "error": error} for error in errors]
+
+    try:
+        for pdf_path in pdf_paths:
+            document_name, store_key, task, result = _plan_document(pdf_path, store, document_dir, tokenize)
+            if task is not None and use_pool:
+                if pool is None:
+                    pool = multiprocessing.Pool(processes=min(workers, len(pdf_paths)))
+                if measured:
+                    result = pool.apply_async(pipeline_metrics.run_measured, (_prepare_document, task))
+                else:
+                    result = pool.apply_async(_prepare_document, task)
+            pending.append((document_name, store_key, task, result))
+            if len(pending) > window:
+                yield finish(*pending.popleft())
+        while pending:
+            yield finish(*pending.popleft())
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+def _plan_document(pdf_path, store, document_dir, tokenize):
+    """
+    Looks one document up in the block store. Returns (document name, store
+    key, task, sections): the stored sections with task None, or the
+    arguments of the _prepare_document task that prepares it.
+    """
+    document_name = os.path.basename(pdf_path)
+    digest = None
+    if store is not None or document_dir is not None:
+        digest = file_digest(pdf_path)
+    model_data = None
+    if document_dir is not None:
+        with stage('load_document_model'):
+            model_data = read_document_model(document_dir, pdf_path)
+    # Sections built from a document model follow that model, which
+    # challenge_1a rewrites for the same PDF when its settings change, so
+    # the model's own digest is part of the store key
+    store_key = digest if model_data is None else f"{digest}:{hashlib.sha256(model_data).hexdigest()}"
+    if store is not None:
+        with stage('block_store'):
+            cached_sections = _stored_sections(store, store_key, document_name)
+        if cached_sections is not None:
+            return document_name, store_key, None, cached_sections
+    model = None
+    if document_dir is not None:
+        with stage('load_document_model'):
+            model = parse_document_model(model_data, digest) if model_data is not None else None
+        if model is None:
+            print(f"Warning: no document model for '{pdf_path}' in '{document_dir}'. Parsing it with PyPDF2.", file=sys.stderr)
+    return document_name, store_key, (pdf_path, model, tokenize), None
+
+def _prepare_sections(pdf_path, document_name, errors=None, model=None, tokenize=True):
+    """
+    Uncached body of prepare_sections. Blocks come from the document model
+    when one is given and from PyPDF2 otherwise. With tokenize=False the
+    sections' 'tokens' are left as None.
+    """
+    if model is not None:
+        extracted_blocks = blocks_from_document_model(model)
+    else:
+        extracted_blocks = iter_pdf_blocks(pdf_path, errors)
+
+    # Skip blocks that are too short to be meaningful sections. Short blocks
+    # are only held on to until the first long one, as a language sample
+    # for documents without any long block.
+    section_blocks = []
+    short_blocks = []
+    # Blocks are read lazily, so this stage includes the PDF parsing
+    with stage('extract'):
+        for i, block in enumerate(extracted_blocks):
+            if len(block['text']) >= MIN_SECTION_LENGTH:
+                section_blocks.append((i, block))
+                short_blocks = []
+            elif not section_blocks:
+                short_blocks.append(block)
+
+    # Detect the language once per document; only when that guess is
+    # uncertain is each block detected separately.
+    with stage('detect_language'):
+        document_lang, lang_confidence = detect_document_language([block for _, block in section_blocks] or short_blocks)
+        if lang_confidence < LANG_CONFIDENCE_THRESHOLD:
+            document_lang = None
+        block_langs = [document_lang or detect_language(block['text']) for _, block in section_blocks]
+    
+    document_sections_candidates = []
+
+    # Tokenize the whole document in one batch (shared CJK lines are analyzed once)
+    if tokenize:
+        with stage('tokenize'):
+            block_token_lists = preprocess_texts([block['text'] for _, block in section_blocks], block_langs)
+    else:
+        block_token_lists = [None] * len(section_blocks)
+
+    # Identify potential sections from extracted blocks
+    for (i, block), block_lang, block_tokens in zip(section_blocks, block_langs, block_token_lists):
+        block_text = block['text']
+        block_page = block['page_number']
+        
+        # Determine section title based on heuristics or default
+        section_title = f"Content Block {i+1} (Page {block_page})" 
+        if block['is_title_candidate'] and block['original_line']:
+            section_title = block['original_line']
+        elif len(block_text.split('\n')[0].split()) <= MAX_TITLE_WORDS:
+             # If the first line of the block is short, use it as a title
+             section_title = block_text.split('\n')[0].strip()
+        
+        document_sections_candidates.append({
+            "document": document_name,
+            "page_number": block_page,
+            "section_title": section_title,
+            "full_text": block_text, # Keep full text for sub-section analysis
+            "lang": block_lang, # Paragraphs reuse the block's language
+            "tokens": block_tokens
+        })
+
+    return document_sections_candidates
+
+def deduplicate_sections(documents, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Groups near-duplicate sections across all documents and keeps one
+    representative per group: the first in document order (see
+    SectionDeduplicator).
+
+    Returns (documents, near_duplicates): the documents with only their
+    representative sections, and one record per group that had duplicates,
+    listing the document and page of every duplicate.
+    """
+    deduplicator = SectionDeduplicator(threshold)
+    kept_documents = [(document_name, deduplicator.add(sections)) for document_name, sections in documents]
+    return kept_documents, deduplicator.near_duplicates()
+
+class SectionDeduplicator:
+    """
+    Groups near-duplicate sections across documents added one at a time.
+    add() keeps the sections that start a group and tokenizes those without
+    tokens (see prepare_documents' tokenize), in one batch per document; the
+    other members of a group are never tokenized. Only the document, page
+    and title of each section are remembered for the near_duplicates report.
+    """
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.index = NearDuplicateIndex(threshold)
+        self.groups = {} # representative key -> near_duplicates record
+        self.document_count = 0
+
+    def add(self, sections):
+        doc_index = self.document_count
+        self.document_count += 1
+        kept = []
+        duplicate_count = 0
+        with stage('deduplicate'):
+            for section_index, section in enumerate(sections):
+                key = (doc_index, section_index)
+                representative = self.index.add(key, section['full_text'])
+                if representative == key:
+                    kept.append(section)
+                    self.groups[key] = {
+                        "document": section['document'],
+                        "page_number": section['page_number'],
+                        "section_title": section['section_title'],
+                        "duplicates": []
+                    }
+                else:
+                    self.groups[representative]["duplicates"].append(
+                        {"document": section['document'], "page_number": section['page_number']})
+                    duplicate_count += 1
+        pipeline_metrics.count('near_duplicate_sections', duplicate_count)
+
+        untokenized = [section for section in kept if section['tokens'] is None]
+        if untokenized:
+            with stage('tokenize'):
+                token_lists = preprocess_texts([section['full_text'] for section in untokenized],
+                                               [section['lang'] for section in untokenized])
+            for section, tokens in zip(untokenized, token_lists):
+                section['tokens'] = tokens
+        return kept
+
+    def near_duplicates(self):
+        return [group for group in self.groups.values() if group["duplicates"]]
+
+def analyze_documents(pdf_paths, persona, job_to_be_done, scoring=SCORING_METHOD, store=None,
+                      workers=PREPARE_WORKERS, document_dir=None, top_k=None, jsonl_path=None,
+                      dedup=DEDUP_BLOCKS):
+    """
+    Main function to orchestrate document analysis. It extracts content,
+    calculates relevance, ranks sections, and formats the output as JSON.
+
+    scoring selects the relevance function: 'overlap' (share of block tokens
+    that are query tokens) or 'bm25' (BM25 over an inverted index of every
+    block in the collection). store is an optional BlockStore that lets
+    unchanged PDFs skip parsing and tokenization. workers > 1 extracts and
+    tokenizes documents in parallel processes; the output is the same.
+    document_dir points at the document models written by challenge_1a, whose
+    heading-bounded sections then replace the PyPDF2 block segmentation.
+    top_k, jsonl_path and dedup are described in analyze_documents_batch.
+    """
+    return analyze_documents_batch(pdf_paths, [(persona, job_to_be_done)], scoring, store, workers,
+                                   document_dir, top_k, [jsonl_path] if jsonl_path else None, dedup)[0]
+
+def analyze_documents_batch(pdf_paths, queries, scoring=SCORING_METHOD, store=None,
+                            workers=PREPARE_WORKERS, document_dir=None, top_k=None, jsonl_paths=None,
+                            dedup=DEDUP_BLOCKS):
+    """
+    Analyzes one document collection for several (persona, job_to_be_done)
+    queries at once and returns one challenge1b output per query, in order.
+
+    The collection is extracted, tokenized and indexed a single time. All
+    queries are then scored together as one block-by-term matrix times a
+    term-by-query matrix (see retrieval.score_matrix), so adding queries
+    does not repeat any per-document work.
+
+    Documents that fail to parse are listed under "failed_documents" in the
+    metadata of every output; whatever text was read from them is still used.
+
+    With top_k, only the top_k sections (by relevance, across all documents)
+    and the top_k sub-sections are kept, in bounded heaps. With jsonl_paths
+    (one path per query), each query's results are written to its path as
+    JSON Lines while they are ranked, and only the metadata is returned.
+
+    With dedup, near-duplicate sections (repeated boilerplate, successive
+    versions of a document) are grouped before tokenization and only one
+    representative per group is tokenized, scored and ranked. The groups are
+    listed under "near_duplicates" (see deduplicate_sections).
+    """
+    if scoring not in ('overlap', 'bm25'):
+        raise ValueError(f"Unknown scoring method: {scoring}")
+    processing_timestamp = datetime.now().isoformat()
+
+    # Step 1: Extract, tokenize and index the sections of one document at a
+    # time. IDF and the average block length are collection-wide statistics,
+    # so every block is indexed before anything is scored; meanwhile each
+    # section's text goes to a spool file and its tokens are dropped, so only
+    # compact section records stay in memory (see index_sections).
+    # With dedup, tokenization waits until near-duplicates are grouped.
+    index = BM25Index()
+    deduplicator = SectionDeduplicator() if dedup else None
+    documents = []
+    failures = []
+    with TextSpool() as spool:
+        for document_name, sections, document_failures in iter_prepared_documents(
+                pdf_paths, store, workers, document_dir, tokenize=not dedup):
+            failures.extend(document_failures)
+            if deduplicator is not None:
+                sections = deduplicator.add(sections)
+            documents.append((document_name, index_sections(index, sections, spool)))
+        near_duplicates = deduplicator.near_duplicates() if deduplicator is not None else None
+
+        # Step 2: Score and rank every query against the index, one document
+        # at a time, re-reading the text of the sections that are analyzed
+        return answer_queries(documents, index, queries, [os.path.basename(p) for p in pdf_paths], failures,
+                              scoring, top_k, jsonl_paths, near_duplicates, processing_timestamp, spool.read)
+
+def build_index(documents):
+    """
+    Indexes the tokens of every section of documents in a new BM25Index and
+    stores each section's 'block_id'. Returns the index.
+    """
+    index = BM25Index()
+    for _, sections in documents:
+        index_sections(index, sections)
+    return index
+
+def index_sections(index, sections, spool=None):
+    """
+    Adds the tokens of sections to index and stores each section's
+    'block_id'. With a TextSpool, the sections are compacted for ranking:
+    'full_text' moves to the spool (see TextSpool.read) and 'tokens' are
+    dropped. Returns sections.
+    """
+    with stage('index'):
+        for section in sections:
+            section['block_id'] = index.add(section['tokens'])
+            if spool is not None:
+                section['text_span'] = spool.write(section.pop('full_text'))
+                del section['tokens']
+    return sections
+
+class TextSpool:
+    """
+    Temporary file holding the full text of indexed sections, so ranking
+    re-reads the few sections whose paragraphs it analyzes instead of
+    keeping the text of the whole collection in memory.
+    """
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.file.seek(self.size)
+        self.file.write(data)
+        span = (self.size, len(data))
+        self.size += len(data)
+        return span
+
+    def read(self, section):
+        offset, length = section['text_span']
+        self.file.seek(offset)
+        return self.file.read(length).decode('utf-8')
+
+def _full_text(section):
+    return section['full_text']
+
+def answer_queries(documents, index, queries, input_documents, failures=None, scoring=SCORING_METHOD,
+                   top_k=None, jsonl_paths=None, near_duplicates=None, processing_timestamp=None,
+                   read_text=_full_text):
+    """
+    Scores and ranks already indexed documents (see build_index) for each
+    (persona, job_to_be_done) query and returns one challenge1b output per
+    query, in order. input_documents are the file names listed in the
+    metadata; read_text returns a section's full text (TextSpool.read for
+    compacted sections); the other arguments are described in
+    analyze_documents_batch.
+
+    Each section's 'relevance_score' is overwritten for every query, so
+    documents must not be shared by concurrent calls.
+    """
+    if processing_timestamp is None:
+        processing_timestamp = datetime.now().isoformat()
+
+    # Score every block against every query in one matrix product
+    # Combine persona and job for query keywords, preprocess them multilingually
+    with stage('score'):
+        query_token_lists = [preprocess_text(f"{persona} {job_to_be_done}") for persona, job_to_be_done in queries]
+        block_scores = score_matrix(index, query_token_lists, scoring)
+
+    outputs = []
+    for query_index, (persona, job_to_be_done) in enumerate(queries):
+        query_tokens = query_token_lists[query_index]
+        if scoring == 'bm25':
+            score_paragraph = lambda tokens: index.score_tokens(tokens, query_tokens)
+        else:
+            score_paragraph = lambda tokens: calculate_relevance_score(tokens, query_tokens)
+
+        for _, sections in documents:
+            for section in sections:
+                section['relevance_score'] = float(block_scores[section['block_id'], query_index])
+
+        metadata = {
+            "input_documents": list(input_documents),
+            "persona": persona,
+            "job_to_be_done": job_to_be_done,
+            "processing_timestamp": processing_timestamp
+        }
+        if failures:
+            metadata["failed_documents"] = failures
+
+        # Ranking includes the sub-section analysis (and, for JSON Lines, the writing)
+        with stage('rank'):
+            if jsonl_paths:
+                write_ranked_jsonl(jsonl_paths[query_index], metadata, documents, score_paragraph, top_k,
+                                   near_duplicates, read_text)
+                outputs.append({"metadata": metadata})
+            else:
+                # Keep the metadata block first in the serialized output
+                output = {"metadata": metadata, **rank_sections(documents, score_paragraph, top_k, read_text)}
+                if near_duplicates is not None:
+                    output["near_duplicates"] = near_duplicates
+                outputs.append(output)
+
+    return outputs
+
+class RankedSection:
+    """
+    One entry of 'extracted_sections'.
+    """
+    __slots__ = ('document', 'page_number', 'section_title', 'importance_rank', 'relevance_score')
+
+    def __init__(self, document, page_number, section_title, importance_rank, relevance_score):
+        self.document = document
+        self.page_number = page_number
+        self.section_title = section_title
+        self.importance_rank = importance_rank
+        self.relevance_score = relevance_score # Used for top-k selection only, not output
+
+    def to_dict(self):
+        return {
+            "document": self.document,
+            "page_number": self.page_number,
+            "section_title": self.section_title,
+            "importance_rank": self.importance_rank
+        }
+
+class SubSection:
+    """
+    One entry of 'sub_section_analysis'.
+    """
+    __slots__ = ('document', 'refined_text', 'page_number', 'relevance_score')
+
+    def __init__(self, document, refined_text, page_number, relevance_score):
+        self.document = document
+        self.refined_text = refined_text
+        self.page_number = page_number
+        self.relevance_score = relevance_score # Used for sorting only, not output
+
+    def to_dict(self):
+        return {
+            "document": self.document,
+            "refined_text": self.refined_text,
+            # Outputting just page_number for simplicity as per user's earlier example
+            "page_number": self.page_number
+        }
+
+def iter_ranked_sections(documents, score_paragraph, sub_sections, read_text=_full_text):
+    """
+    Ranks the scored candidate sections of each document and yields a
+    RankedSection per section, one document at a time. The relevant
+    paragraphs of each document's top sections, read with read_text, are
+    pushed into sub_sections (a retrieval.TopK) along the way.
+    """
+    for document_name, document_sections_candidates in documents:
+        # Document names repeat in every record; share one string object
+        document_name = sys.intern(document_name)
+        # Sort candidate sections by relevance score in descending order.
+        # A sorted copy keeps the extraction order intact for the next query.
+        ranked_sections = sorted(document_sections_candidates, key=lambda x: x['relevance_score'], reverse=True)
+        
+        # Assign importance_rank and prepare for final output
+        for rank, section in enumerate(ranked_sections):
+            yield RankedSection(document_name, section['page_number'], section['section_title'],
+                                rank + 1, # Ranks start from 1
+                                section['relevance_score'])
+            
+            # Sub-section analysis for a limited number of top relevant sections
+            # This balances detailed analysis with performance constraints.
+            if rank < SUBSECTION_SOURCE_SECTIONS:
+                # Split the full section text into individual paragraphs or smaller chunks
+                # assuming paragraphs are separated by two or more newlines.
+                paragraphs = [p.strip() for p in read_text(section).split('\n\n') if p.strip()]
+                
+                for paragraph in paragraphs:
+                    if len(paragraph) < MIN_SUBSECTION_LENGTH: # Skip very short paragraphs
+                        continue
+                        
+                    paragraph_tokens = preprocess_text(paragraph, section['lang'])
+                    sub_relevance_score = score_paragraph(paragraph_tokens)
+                    
+                    if sub_relevance_score > 0.0: # Only include sub-sections that show some relevance
+                        sub_sections.push(sub_relevance_score,
+                                          SubSection(document_name, paragraph, section['page_number'], sub_relevance_score))
+
+def rank_sections(documents, score_paragraph, top_k=None, read_text=_full_text):
+    """
+    Ranks the scored candidate sections of each document, analyzes the
+    paragraphs of each document's top sections and returns the
+    'extracted_sections' and 'sub_section_analysis' parts of the output.
+    Sections stay in document order, best first within each document;
+    sub-sections are sorted by relevance across all documents.
+    """
+    sub_sections = TopK(top_k)
+    if top_k is None:
+        sections = list(iter_ranked_sections(documents, score_paragraph, sub_sections, read_text))
+    else:
+        best_sections = TopK(top_k)
+        for section in iter_ranked_sections(documents, score_paragraph, sub_sections, read_text):
+            best_sections.push(section.relevance_score, section)
+        sections = best_sections.in_push_order()
+
+    return {
+        "extracted_sections": [section.to_dict() for section in sections],
+        "sub_section_analysis": [sub_section.to_dict() for sub_section in sub_sections.ranked()]
+    }
+
+def write_ranked_jsonl(output_path, metadata, documents, score_paragraph, top_k=None, near_duplicates=None,
+                       read_text=_full_text):
+    """
+    Writes one query's results as JSON Lines: a {"metadata": ...} line,
+    then one {"extracted_section": ...} line per section, one
+    {"sub_section": ...} line per sub-section and, when near_duplicates is
+    given, one {"near_duplicate": ...} line per group. Without top_k, sections are
+    written (and flushed) document by document as they are ranked, so the
+    file can be read while it grows.
+    """
+    def write(f, key, record):
+        f.write(json.dumps({key: record}, ensure_ascii=False) + "\n")
+
+    sub_sections = TopK(top_k)
+    best_sections = TopK(top_k) if top_k is not None else None
+    with open(output_path, 'w', encoding='utf-8') as f:
+        write(f, "metadata", metadata)
+        current_document = None
+        for section in iter_ranked_sections(documents, score_paragraph, sub_sections, read_text):
+            if best_sections is not None:
+                best_sections.push(section.relevance_score, section)
+                continue
+            if section.document is not current_document:
+                f.flush()
+                current_document = section.document
+            write(f, "extracted_section", section.to_dict())
+        if best_sections is not None:
+            for section in best_sections.in_push_order():
+                write(f, "extracted_section", section.to_dict())
+        for sub_section in sub_sections.ranked():
+            write(f, "sub_section", sub_section.to_dict())
+        for group in near_duplicates or ():
+            write(f, "near_duplicate", group)
+
+# --- Collection Input/Output ---
+def load_collection(input_dir):
+    """
+    Reads challenge1b_input.json from a collection folder. Returns
+    (persona, job_to_be_done, pdf_paths) for the listed PDFs found in the
+    folder's 'PDFs' subfolder; PDFs that are missing are reported and skipped.
+    Raises FileNotFoundError when the input file or the subfolder is missing.
+    """
+    input_json_filename = "challenge1b_input.json"
+    input_json_path = os.path.join(input_dir, input_json_filename)
+    if not os.path.exists(input_json_path):
+        raise FileNotFoundError(
+            f"{input_json_filename} not found in '{input_dir}'. "
+            f"Please ensure '{input_json_filename}' is present in the mounted input directory.")
+
+    with open(input_json_path, 'r', encoding='utf-8') as f:
+        input_data = json.load(f)
+
+    # Extract persona and job-to-be-done
+    persona_role = input_data.get("persona", {}).get("role", "Unknown Persona")
+    job_task = input_data.get("job_to_be_done", {}).get("task", "Unknown Task")
+
+    # PDFs are expected in a 'PDFs' subfolder within the collection folder
+    pdf_subfolder = os.path.join(input_dir, "PDFs")
+    if not os.path.exists(pdf_subfolder):
+        raise FileNotFoundError(
+            f"'PDFs' subfolder not found in '{input_dir}'. Please ensure your PDF documents "
+            "are placed in an 'PDFs' subfolder within the mounted input directory.")
+
+    pdf_paths = []
+    for doc_info in input_data.get("documents", []):
+        filename = doc_info.get("filename")
+        if filename:
+            full_pdf_path = os.path.join(pdf_subfolder, filename)
+            if os.path.exists(full_pdf_path):
+                pdf_paths.append(full_pdf_path)
+            else:
+                print(f"Warning: PDF file not found: '{full_pdf_path}'. It will be skipped.", file=sys.stderr)
+        else:
+            print(f"Warning: Document entry missing 'filename' in {input_json_filename}: {doc_info}", file=sys.stderr)
+
+    return persona_role, job_task, pdf_paths
+
+def settings_from_env():
+    """
+    Reads the analysis settings documented in the main block from the
+    environment, applies CJK_TOKENIZATION and PREWARM_LANGUAGES, and returns
+    the remaining ones as keyword arguments for write_collection_output.
+    Raises ValueError for an invalid setting.
+    """
+    global CJK_TOKENIZATION
+    scoring = os.getenv('SCORING_METHOD', SCORING_METHOD)
+    if scoring not in ('overlap', 'bm25'):
+        raise ValueError(f"unknown SCORING_METHOD '{scoring}', expected 'overlap' or 'bm25'.")
+    # 'ngram' skips morphological analysis of Japanese/Korean text
+    CJK_TOKENIZATION = os.getenv('CJK_TOKENIZATION', CJK_TOKENIZATION)
+    if CJK_TOKENIZATION not in ('morph', 'ngram'):
+        raise ValueError(f"unknown CJK_TOKENIZATION '{CJK_TOKENIZATION}', expected 'morph' or 'ngram'.")
+    # Optionally load tokenizers before any worker processes are forked,
+    # e.g. PREWARM_LANGUAGES=ja,ko for CJK collections
+    prewarm_languages = os.getenv('PREWARM_LANGUAGES')
+    if prewarm_languages:
+        prewarm([lang.strip() for lang in prewarm_languages.split(',') if lang.strip()])
+    # 0 uses every available core
+    workers = int(os.getenv('PREPARE_WORKERS', PREPARE_WORKERS)) or (os.cpu_count() or 1)
+
+    # Document models from challenge_1a (process_pdfs.py --document-dir)
+    document_dir = os.getenv('DOCUMENT_MODEL_DIR')
+
+    # Optional persistent store of prepared blocks, e.g. on a mounted volume
+    store = None
+    block_store_path = os.getenv('BLOCK_STORE_PATH')
+    if block_store_path:
+        store = BlockStore(block_store_path, segmentation_config(document_models=bool(document_dir)))
+        store.prune_stale()
+
+    return {
+        "scoring": scoring,
+        "store": store,
+        "workers": workers,
+        "document_dir": document_dir,
+        # Optionally keep only the best TOP_K sections and sub-sections
+        "top_k": int(os.getenv('TOP_K', '0')) or None,
+        # OUTPUT_FORMAT=jsonl streams ranked results to challenge1b_output.jsonl
+        # instead of building the whole JSON document in memory
+        "output_format": os.getenv('OUTPUT_FORMAT', 'json'),
+        # DEDUP_BLOCKS=1 ranks one representative per group of near-duplicate blocks
+        "dedup": os.getenv('DEDUP_BLOCKS', '1' if DEDUP_BLOCKS else '') not in ('', '0')
+    }
+
+def write_collection_output(pdf_paths, persona, job_to_be_done, output_dir, scoring=SCORING_METHOD,
+                            store=None, workers=PREPARE_WORKERS, document_dir=None, top_k=None,
+                            output_format='json', dedup=DEDUP_BLOCKS):
+    """
+    Analyzes one collection and writes challenge1b_output.json (or, with
+    output_format='jsonl', challenge1b_output.jsonl) to output_dir.
+    Returns the path written.
+    """
+    if output_format == 'jsonl':
+        output_file_path = os.path.join(output_dir, "challenge1b_output.jsonl")
+        analyze_documents(pdf_paths, persona, job_to_be_done, scoring=scoring, store=store,
+                          workers=workers, document_dir=document_dir, top_k=top_k,
+                          jsonl_path=output_file_path, dedup=dedup)
+        return output_file_path
+
+    output_data = analyze_documents(pdf_paths, persona, job_to_be_done, scoring=scoring, store=store,
+                                    workers=workers, document_dir=document_dir, top_k=top_k, dedup=dedup)
+
+    # The output is written to the collection folder itself, as specified by the hackathon
+    output_file_path = os.path.join(output_dir, "challenge1b_output.json")
+    with stage('serialize'), open(output_file_path, 'w', encoding='utf-8') as f:
+        json.dump(output_data, f, indent=4, ensure_ascii=False) # Use ensure_ascii=False for proper multilingual JSON output
+    return output_file_path
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    # Define input and output directories.
+    # Docker mounts the local collection folder to /app/input
+    input_dir = os.getenv('INPUT_DIR', '/app/input') 
+    # Output is written back to the same mounted input folder as per hackathon standard
+    output_dir = os.getenv('OUTPUT_DIR', '/app/input') 
+
+    # Ensure the output directory exists. (It's the mounted input dir, so it should exist)
+    os.makedirs(output_dir, exist_ok=True)
+
+    input_json_filename = "challenge1b_input.json" 
+
+    # Load input data from challenge1b_input.json in the mounted input directory;
+    # PDFs are expected in its 'PDFs' subfolder
+    try:
+        persona_role, job_task, pdf_paths = load_collection(input_dir)
+
+        if not pdf_paths:
+            print(f"No valid PDF files found or specified in '{os.path.join(input_dir, input_json_filename)}'. No analysis will be performed.", file=sys.stderr)
+            exit(1)
+
+        print(f"Found {len(pdf_paths)} PDF(s) to process based on {input_json_filename} in '{input_dir}'.")
+        print(f"Persona: '{persona_role}'")
+        print(f"Job to be done: '{job_task}'")
+        
+        # PIPELINE_METRICS=1 records per-stage timings and peak memory in
+        # pipeline_metrics.json next to the output
+        if os.getenv('PIPELINE_METRICS'):
+            pipeline_metrics.enable()
+        # PROFILE_DOCUMENT=<file name> profiles that document's preparation
+        # (PROFILER=cprofile or pyinstrument) into the output directory
+        if os.getenv('PROFILE_DOCUMENT'):
+            pipeline_metrics.set_profile_target(os.getenv('PROFILE_DOCUMENT'), output_dir,
+                                                os.getenv('PROFILER', 'cprofile'))
+
+        # Call the main analysis function. Settings come from SCORING_METHOD,
+        # CJK_TOKENIZATION, PREWARM_LANGUAGES, PREPARE_WORKERS,
+        # DOCUMENT_MODEL_DIR, BLOCK_STORE_PATH, TOP_K, OUTPUT_FORMAT and DEDUP_BLOCKS.
+        settings = settings_from_env()
+        output_file_path = write_collection_output(pdf_paths, persona_role, job_task, output_dir, **settings)
+        
+        print(f"Analysis complete. Output saved to '{output_file_path}'.")
+        if pipeline_metrics.METRICS is not None:
+            metrics_path = os.path.join(output_dir, "pipeline_metrics.json")
+            pipeline_metrics.write(metrics_path)
+            print(f"Stage metrics saved to '{metrics_path}'.")
+
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        exit(1)
+    except ValueError as e:
+        if isinstance(e, json.JSONDecodeError):
+            print(f"Error decoding {input_json_filename}: {e}", file=sys.stderr)
+            print(f"Please ensure '{input_json_filename}' is a valid JSON file.", file=sys.stderr)
+        else:
+            print(f"Error: {e}", file=sys.stderr)
+        exit(1)
+    except Exception as e:
+        print(f"An unexpected error occurred during processing: {e}", file=sys.stderr)
+        import traceback
+        traceback.print_exc(file=sys.stderr)
+        exit(1)
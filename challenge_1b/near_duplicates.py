@@ -0,0 +1,101 @@
+import re
+import zlib
+
+import numpy as np
+
+# --- MinHash parameters ---
+# Blocks are compared as sets of character shingles of this length. Working
+# on characters rather than tokens lets blocks be grouped before they are
+# tokenized, in any language (CJK text included).
+SHINGLE_SIZE = 5
+# Number of hash functions in a MinHash signature
+NUM_PERMUTATIONS = 64
+# LSH bands; NUM_PERMUTATIONS must be a multiple. Two blocks become
+# candidates when all rows of any band agree, which is likely above a
+# similarity of about (1 / bands) ** (1 / rows) = 0.5 with 16 bands of 4.
+LSH_BANDS = 16
+# Signatures use hash functions (a * x + b) mod HASH_PRIME over 32-bit
+# shingle hashes; a and b stay below 2**32 so the products fit in uint64.
+HASH_PRIME = (1 << 32) + 15
+HASH_SEED = 1
+
+_rng = np.random.RandomState(HASH_SEED)
+_HASH_A = _rng.randint(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_HASH_B = _rng.randint(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+_WHITESPACE = re.compile(r'\s+')
+
+def shingle_hashes(text, size=SHINGLE_SIZE):
+    """
+    32-bit hashes of the distinct character shingles of text, after
+    lowercasing and collapsing whitespace. Text shorter than one shingle is
+    a single shingle.
+    """
+    normalized = _WHITESPACE.sub(' ', text.lower()).strip()
+    if len(normalized) <= size:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+    return np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+def minhash(text):
+    """
+    MinHash signature of text: for each hash function, the minimum hash
+    over the text's shingles. The share of equal positions between two
+    signatures estimates the Jaccard similarity of their shingle sets.
+    """
+    hashes = shingle_hashes(text)
+    return ((np.outer(_HASH_A, hashes) + _HASH_B[:, None]) % HASH_PRIME).min(axis=1)
+
+def estimate_similarity(signature_a, signature_b):
+    return float(np.count_nonzero(signature_a == signature_b)) / len(signature_a)
+
+class NearDuplicateIndex:
+    """
+    Groups texts whose estimated Jaccard similarity reaches threshold.
+
+    Texts are added in order. The first text of a group is its
+    representative; only representatives are indexed, in LSH buckets (one
+    per band of their signature), so each new text is compared with the
+    few representatives it shares a bucket with rather than with all of
+    them. Groups never chain: a text joins the most similar representative
+    above the threshold, or starts a group of its own.
+    """
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.rows = NUM_PERMUTATIONS // LSH_BANDS
+        self.buckets = {} # (band, band values) -> [representative keys]
+        self.signatures = {} # representative key -> signature
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _bands(self, signature):
+        for band in range(LSH_BANDS):
+            yield (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+
+    def add(self, key, text):
+        """
+        Adds one text under key. Returns the key of the representative it
+        duplicates, or key itself when it starts a new group.
+        """
+        signature = minhash(text)
+        bands = list(self._bands(signature))
+
+        candidates = []
+        for band in bands:
+            for candidate in self.buckets.get(band, ()):
+                if candidate not in candidates:
+                    candidates.append(candidate)
+        best, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = estimate_similarity(signature, self.signatures[candidate])
+            if similarity >= best_similarity and (best is None or similarity > best_similarity):
+                best, best_similarity = candidate, similarity
+        if best is not None:
+            return best
+
+        self.signatures[key] = signature
+        for band in bands:
+            self.buckets.setdefault(band, []).append(key)
+        return key
@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+import cProfile
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Opt-in instrumentation. Nothing is recorded until enable() is called, and
+# stage() then costs one nullcontext per call. Stages may nest; an outer
+# stage's times include its inner stages.
+METRICS = None
+# (document name, output directory, profiler) set by set_profile_target()
+PROFILE_TARGET = None
+# Only one profiler can be active at a time, so nested documents (e.g. a
+# task calling another task function) are profiled by the outermost one.
+_profiling = False
+
+def _add(table, name, wall, cpu, calls=1):
+    entry = table.setdefault(name, [0, 0.0, 0.0])
+    entry[0] += calls
+    entry[1] += wall
+    entry[2] += cpu
+
+def _format(table):
+    return {
+        name: {"calls": calls, "wall_seconds": round(wall, 6), "cpu_seconds": round(cpu, 6)}
+        for name, (calls, wall, cpu) in table.items()
+    }
+
+def _peak_memory_mb(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+class StageMetrics:
+    """
+    Wall time, CPU time and call counts per stage, overall, per document and
+    per page, plus named counters. Worker processes collect their own
+    StageMetrics (see run_measured) which the parent merges.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.documents = {}
+        self.counters = {}
+        self.current_document = None
+        self.started_wall = time.perf_counter()
+        self.started_cpu = time.process_time()
+
+    def _document(self, name):
+        return self.documents.setdefault(name, {"stages": {}, "pages": {}, "counters": {}})
+
+    @contextmanager
+    def stage(self, name, page=None):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            _add(self.stages, name, wall, cpu)
+            if self.current_document is not None:
+                document = self._document(self.current_document)
+                _add(document["stages"], name, wall, cpu)
+                if page is not None:
+                    _add(document["pages"].setdefault(str(page), {}), name, wall, cpu)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+        if self.current_document is not None:
+            counters = self._document(self.current_document)["counters"]
+            counters[name] = counters.get(name, 0) + n
+
+    def snapshot(self):
+        return {"stages": self.stages, "documents": self.documents, "counters": self.counters}
+
+    def merge(self, snapshot):
+        for name, (calls, wall, cpu) in snapshot["stages"].items():
+            _add(self.stages, name, wall, cpu, calls)
+        for name, n in snapshot["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + n
+        for document_name, other in snapshot["documents"].items():
+            document = self._document(document_name)
+            for name, (calls, wall, cpu) in other["stages"].items():
+                _add(document["stages"], name, wall, cpu, calls)
+            for page, stages in other["pages"].items():
+                for name, (calls, wall, cpu) in stages.items():
+                    _add(document["pages"].setdefault(page, {}), name, wall, cpu, calls)
+            for name, n in other["counters"].items():
+                document["counters"][name] = document["counters"].get(name, 0) + n
+
+    def to_dict(self):
+        # Stage CPU times include worker processes; this one does not.
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started_wall, 6),
+            "main_cpu_seconds": round(time.process_time() - self.started_cpu, 6),
+            "peak_memory_mb": {
+                "main": _peak_memory_mb(resource.RUSAGE_SELF) if resource else None,
+                "workers": _peak_memory_mb(resource.RUSAGE_CHILDREN) if resource else None,
+            },
+            "stages": _format(self.stages),
+            "counters": dict(self.counters),
+            "documents": {
+                name: {
+                    "stages": _format(document["stages"]),
+                    "counters": document["counters"],
+                    "pages": {page: _format(stages) for page, stages in document["pages"].items()},
+                }
+                for name, document in self.documents.items()
+            },
+        }
+
+def enable():
+    global METRICS
+    METRICS = StageMetrics()
+    return METRICS
+
+def stage(name, page=None):
+    return METRICS.stage(name, page) if METRICS is not None else nullcontext()
+
+def count(name, n=1):
+    if METRICS is not None:
+        METRICS.count(name, n)
+
+def set_profile_target(document_name, output_dir, profiler="cprofile"):
+    global PROFILE_TARGET
+    PROFILE_TARGET = (document_name, output_dir, profiler)
+
+@contextmanager
+def profiled(output_prefix, profiler="cprofile"):
+    """Profiles the block with cProfile (<prefix>.prof, for pstats or
+    snakeviz) or pyinstrument (<prefix>.html) when it is installed."""
+    global _profiling
+    if _profiling:
+        yield
+        return
+    _profiling = True
+    try:
+        with _profiler(output_prefix, profiler):
+            yield
+    finally:
+        _profiling = False
+
+@contextmanager
+def _profiler(output_prefix, profiler):
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("Warning: pyinstrument not found, profiling with cProfile.", file=sys.stderr)
+        else:
+            profile = Profiler()
+            profile.start()
+            try:
+                yield
+            finally:
+                profile.stop()
+                with open(f"{output_prefix}.html", "w", encoding="utf-8") as f:
+                    f.write(profile.output_html())
+            return
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(f"{output_prefix}.prof")
+
+@contextmanager
+def document(name, part=None, profile=True):
+    """Attributes the stages recorded inside the block to one document, and
+    profiles the block when that document is the profile target. part
+    distinguishes several blocks for the same document (e.g. page shards)."""
+    previous = METRICS.current_document if METRICS is not None else None
+    if METRICS is not None:
+        METRICS.current_document = name
+    profiling = nullcontext()
+    if profile and PROFILE_TARGET is not None and PROFILE_TARGET[0] == name:
+        _, output_dir, profiler = PROFILE_TARGET
+        stem = os.path.splitext(name)[0] + (f".{part}" if part else "")
+        profiling = profiled(os.path.join(output_dir, stem), profiler)
+    try:
+        with profiling:
+            yield
+    finally:
+        if METRICS is not None:
+            METRICS.current_document = previous
+
+def run_measured(func, args):
+    """Pool task wrapper: runs func(*args) with a fresh StageMetrics and
+    returns (result, metrics snapshot) for the parent to merge."""
+    global METRICS
+    previous = METRICS
+    METRICS = StageMetrics()
+    try:
+        return func(*args), METRICS.snapshot()
+    finally:
+        METRICS = previous
+
+def write(path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(METRICS.to_dict(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
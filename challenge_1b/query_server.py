@@ -0,0 +1,465 @@
+import os
+import sys
+import json
+import time
+import signal
+import hashlib
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import document_analyst as analyst
+from block_store import file_digest
+
+# Resident query server for one collection. document_analyst.py extracts,
+# tokenizes and indexes the whole collection for every run; this server does
+# it once and then answers persona / job-to-be-done queries from memory.
+#
+# 1. The collection's challenge1b_input.json is read and every listed PDF is
+#    prepared (with the BLOCK_STORE_PATH store when one is configured).
+# 2. Query worker processes are started on a copy of the prepared sections
+#    and each builds its own BM25 index. Scoring and ranking are CPU-bound,
+#    so they run in these workers while the asyncio event loop keeps
+#    accepting and parsing requests.
+# 3. The input file and the PDFs folder are polled. When a PDF changes (or
+#    the input file lists other PDFs), only the changed PDFs are prepared
+#    again; a new set of workers is then started on the updated sections and
+#    the previous workers are retired once their queries finish.
+#
+# Requests are plain HTTP/1.1 over localhost TCP or a Unix socket:
+#   POST /query    {"persona": ..., "job_to_be_done": ...} -> challenge1b output
+#                  (the persona and job may also be given as in
+#                  challenge1b_input.json; {"queries": [...]} answers several
+#                  at once and returns {"outputs": [...]}). "scoring" and
+#                  "top_k" override the server defaults for one request.
+#   POST /reload   prepares changed PDFs now instead of at the next poll
+#   GET  /health   liveness and collection size
+#   GET  /metrics  request counts and latency percentiles
+# Every response carries its latency in an X-Latency-Ms header.
+#
+# The other settings are the environment variables of document_analyst.py.
+
+# Seconds between two polls of the collection for changed PDFs. A change is
+# picked up once the files have been stable for one interval.
+POLL_INTERVAL = 1.0
+# Number of recent request latencies kept for the percentiles in /metrics
+LATENCY_WINDOW = 1000
+# Query worker processes; each holds a copy of the collection's sections
+QUERY_WORKERS = 1
+# Largest request body accepted, in bytes
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# Set in each query worker by _init_worker:
+# (documents, index, input_documents, failures, near_duplicates)
+_WARM = None
+
+def _init_worker(documents, input_documents, failures, near_duplicates, languages):
+    global _WARM
+    # The parent handles Ctrl+C and shuts the workers down itself.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Forked workers inherit the parent's loaded models; this only loads
+    # anything when workers are spawned instead.
+    analyst.prewarm(languages)
+    _WARM = (documents, analyst.build_index(documents), input_documents, failures, near_duplicates)
+
+def _ready():
+    return os.getpid()
+
+def _answer(queries, scoring, top_k):
+    """
+    Worker task: answers queries from the worker's warm sections and index.
+    """
+    documents, index, input_documents, failures, near_duplicates = _WARM
+    return analyst.answer_queries(documents, index, queries, input_documents, failures, scoring, top_k,
+                                  near_duplicates=near_duplicates)
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+class WarmCollection:
+    """
+    The prepared sections of one collection folder, kept in memory between
+    queries. Each PDF's sections are kept with the content digest they were
+    prepared from (and, with a document_dir, the digest of its document
+    model), so a reload only prepares PDFs whose content changed.
+    """
+    def __init__(self, collection_dir, store=None, workers=analyst.PREPARE_WORKERS, document_dir=None,
+                 dedup=analyst.DEDUP_BLOCKS):
+        self.collection_dir = collection_dir
+        self.store = store
+        self.workers = workers
+        self.document_dir = document_dir
+        self.dedup = dedup
+        self.pdf_paths = []
+        self.prepared = {} # pdf path -> (digest, sections, failures)
+
+    def digest(self, pdf_path):
+        digest = file_digest(pdf_path)
+        if self.document_dir is not None:
+            model_data = analyst.read_document_model(self.document_dir, pdf_path)
+            if model_data is not None:
+                digest += ":" + hashlib.sha256(model_data).hexdigest()
+        return digest
+
+    def stamps(self):
+        """
+        (size, mtime) of the input file, of every file in the PDFs folder and
+        of the document models of the listed PDFs.
+        """
+        current = {}
+        paths = [os.path.join(self.collection_dir, "challenge1b_input.json")]
+        pdf_subfolder = os.path.join(self.collection_dir, "PDFs")
+        if os.path.isdir(pdf_subfolder):
+            paths.extend(entry.path for entry in os.scandir(pdf_subfolder) if entry.is_file())
+        if self.document_dir is not None:
+            paths.extend(analyst.document_model_path(self.document_dir, p) for p in self.pdf_paths)
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            current[path] = (stat.st_size, stat.st_mtime_ns)
+        return current
+
+    def load(self):
+        """
+        Reads challenge1b_input.json again and prepares every listed PDF that
+        is new or whose content changed. Returns (prepared, removed): the
+        names of the documents prepared and of those no longer listed.
+        """
+        _, _, pdf_paths = analyst.load_collection(self.collection_dir)
+        digests = {pdf_path: self.digest(pdf_path) for pdf_path in pdf_paths}
+        changed = [p for p in dict.fromkeys(pdf_paths) if self.prepared.get(p, (None,))[0] != digests[p]]
+        removed = [os.path.basename(p) for p in self.prepared if p not in digests]
+
+        if changed:
+            # With dedup, tokenization waits until near-duplicates are grouped
+            documents, failures = analyst.prepare_documents(changed, self.store, self.workers,
+                                                            self.document_dir, tokenize=not self.dedup)
+            for pdf_path, (document_name, sections) in zip(changed, documents):
+                errors = [f for f in failures if f['document'] == document_name]
+                self.prepared[pdf_path] = (digests[pdf_path], sections, errors)
+        self.prepared = {p: self.prepared[p] for p in pdf_paths}
+        self.pdf_paths = pdf_paths
+        return [os.path.basename(p) for p in changed], removed
+
+    def snapshot(self):
+        """
+        Returns (documents, input_documents, failures, near_duplicates) for
+        the query workers, in the order of challenge1b_input.json.
+        """
+        documents = [(os.path.basename(p), self.prepared[p][1]) for p in self.pdf_paths]
+        failures = [failure for p in self.pdf_paths for failure in self.prepared[p][2]]
+        near_duplicates = None
+        if self.dedup:
+            documents, near_duplicates = analyst.deduplicate_sections(documents)
+        return documents, [os.path.basename(p) for p in self.pdf_paths], failures, near_duplicates
+
+def parse_queries(request):
+    """
+    Reads the queries of a decoded /query request. Returns (queries, batch),
+    where queries is a list of (persona, job_to_be_done) and batch tells
+    whether the request used the {"queries": [...]} form. Raises ValueError
+    for an invalid request.
+    """
+    batch = "queries" in request
+    items = request["queries"] if batch else [request]
+    if not isinstance(items, list) or not items:
+        raise ValueError("'queries' must be a non-empty list")
+
+    queries = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("every query must be a JSON object")
+        # Accept the challenge1b_input.json form as well as plain strings
+        persona = item.get("persona")
+        job_to_be_done = item.get("job_to_be_done")
+        if isinstance(persona, dict):
+            persona = persona.get("role")
+        if isinstance(job_to_be_done, dict):
+            job_to_be_done = job_to_be_done.get("task")
+        if not isinstance(persona, str) or not isinstance(job_to_be_done, str):
+            raise ValueError("every query needs a 'persona' and a 'job_to_be_done'")
+        queries.append((persona, job_to_be_done))
+    return queries, batch
+
+class QueryServer:
+    """
+    Serves queries against a WarmCollection from a pool of warm worker
+    processes, keeps per-request latency for /metrics and swaps in a new
+    pool whenever the collection is reloaded.
+    """
+    def __init__(self, collection, workers=QUERY_WORKERS, scoring=analyst.SCORING_METHOD, top_k=None):
+        self.collection = collection
+        self.workers = max(workers, 1)
+        self.scoring = scoring
+        self.top_k = top_k
+        self.pool = None
+        self.generation = 0
+        self.loaded_stamps = {}
+        self.reload_lock = None
+
+        self.requests = 0
+        self.failed = 0
+        self.reloads = 0
+        self.last_reload_ms = None
+        self.recent_latencies = []
+
+    async def reload(self, force_pool=False):
+        """
+        Prepares changed PDFs in a thread, so queries keep being answered by
+        the current workers meanwhile, then starts workers on the updated
+        collection. Returns (prepared, removed) as WarmCollection.load.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.reload_lock:
+            start = time.perf_counter()
+            stamps = self.collection.stamps()
+            prepared, removed = await loop.run_in_executor(None, self.collection.load)
+            self.loaded_stamps = stamps
+            if prepared or removed or force_pool or self.pool is None:
+                snapshot = await loop.run_in_executor(None, self.collection.snapshot)
+                await self._start_pool(snapshot)
+                self.reloads += 1
+            self.last_reload_ms = round((time.perf_counter() - start) * 1000, 2)
+        return prepared, removed
+
+    async def _start_pool(self, snapshot):
+        documents = snapshot[0]
+        languages = sorted({section['lang'] for _, sections in documents for section in sections}
+                           & set(analyst.CJK_LANGUAGES))
+        # Loading the models here lets forked workers start with them
+        analyst.prewarm(languages)
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(*snapshot, languages))
+        # Start every worker (and build its index) before it takes queries
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, _ready) for _ in range(self.workers)))
+
+        previous, self.pool = self.pool, pool
+        self.generation += 1
+        if previous is not None:
+            # Queries already queued on the previous workers still finish
+            previous.shutdown(wait=False)
+
+    async def query(self, body):
+        """
+        Answers one /query request body. Returns (status, payload).
+        """
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+            queries, batch = parse_queries(request)
+            scoring = request.get("scoring", self.scoring)
+            if scoring not in ('overlap', 'bm25'):
+                raise ValueError(f"unknown scoring '{scoring}', expected 'overlap' or 'bm25'")
+            top_k = request.get("top_k", self.top_k)
+            if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 0):
+                raise ValueError("'top_k' must be a non-negative integer")
+        except ValueError as e:
+            return 400, {"error": str(e)}
+
+        loop = asyncio.get_running_loop()
+        try:
+            outputs = await loop.run_in_executor(self.pool, _answer, queries, scoring, top_k or None)
+        except BrokenProcessPool:
+            print("Error: a query worker exited; restarting the workers.", file=sys.stderr, flush=True)
+            try:
+                await self.reload(force_pool=True)
+            except Exception as e:
+                print(f"Error restarting the query workers: {e}", file=sys.stderr, flush=True)
+                return 500, {"error": f"query workers exited and could not be restarted: {e}"}
+            return 503, {"error": "query workers restarted, please retry"}
+        except Exception as e:
+            # The client gets an answer (and the request counts as failed)
+            # whatever went wrong while scoring
+            print(f"Error answering a query: {e}", file=sys.stderr, flush=True)
+            return 500, {"error": str(e)}
+        return 200, ({"outputs": outputs} if batch else outputs[0])
+
+    async def dispatch(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "documents": len(self.collection.pdf_paths), "generation": self.generation}
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics()
+        if method == "POST" and path == "/query":
+            return await self.query(body)
+        if method == "POST" and path == "/reload":
+            try:
+                prepared, removed = await self.reload()
+            except (OSError, ValueError) as e:
+                return 500, {"error": str(e)}
+            return 200, {"prepared": prepared, "removed": removed, "generation": self.generation}
+        return 404, {"error": "not found"}
+
+    def _record(self, status, latency_ms):
+        self.requests += 1
+        if status >= 400:
+            self.failed += 1
+        self.recent_latencies.append(latency_ms)
+        del self.recent_latencies[:-LATENCY_WINDOW]
+
+    def metrics(self):
+        latencies = sorted(self.recent_latencies)
+        return {
+            "documents": len(self.collection.pdf_paths),
+            "generation": self.generation,
+            "requests": self.requests,
+            "failed": self.failed,
+            "reloads": self.reloads,
+            "last_reload_ms": self.last_reload_ms,
+            "latency_ms": {
+                "p50": _percentile(latencies, 0.5),
+                "p95": _percentile(latencies, 0.95),
+                "max": latencies[-1] if latencies else None,
+            },
+        }
+
+    async def handle_connection(self, reader, writer):
+        """
+        Minimal HTTP/1.1 handling: one request at a time per connection,
+        kept alive unless the client asks otherwise.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    self._write(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_REQUEST_BYTES:
+                    self._write(writer, 413 if length > 0 else 400, {"error": "invalid Content-Length"},
+                                keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.dispatch(method, path.split('?', 1)[0], body)
+                latency_ms = (time.perf_counter() - start) * 1000
+                self._record(status, latency_ms)
+                if path.startswith("/query"):
+                    print(f"{method} {path} {status}: {latency_ms:.1f} ms", flush=True)
+                self._write(writer, status, payload, keep_alive, latency_ms)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write(writer, status, payload, keep_alive=True, latency_ms=None):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                   500: "Internal Server Error", 503: "Service Unavailable"}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = [
+            f"HTTP/1.1 {status} {reasons.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if latency_ms is not None:
+            head.append(f"X-Latency-Ms: {latency_ms:.2f}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+
+    async def watch(self, poll_interval=POLL_INTERVAL):
+        # Like challenge_1a's pdf_service, files are only reloaded once their
+        # sizes and mtimes have been stable for one poll, so half-copied PDFs
+        # are not parsed.
+        scanned = self.collection.stamps()
+        while True:
+            await asyncio.sleep(poll_interval)
+            current = self.collection.stamps()
+            if current == scanned and current != self.loaded_stamps:
+                try:
+                    prepared, removed = await self.reload()
+                    if prepared or removed:
+                        print(f"Reloaded in {self.last_reload_ms:.1f} ms: prepared {prepared}, removed {removed}.",
+                              flush=True)
+                except (OSError, ValueError) as e:
+                    print(f"Error reloading the collection: {e}", file=sys.stderr, flush=True)
+                    # Retry once the files change again
+                    self.loaded_stamps = current
+            scanned = current
+
+    async def serve(self, host="127.0.0.1", port=8090, unix_socket=None, poll_interval=POLL_INTERVAL, watch=True):
+        self.reload_lock = asyncio.Lock()
+        await self.reload()
+        print(f"Loaded {len(self.collection.pdf_paths)} document(s) in {self.last_reload_ms / 1000:.1f}s.", flush=True)
+
+        if unix_socket:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            print(f"Listening on {unix_socket}", flush=True)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            print(f"Listening on http://{host}:{port}", flush=True)
+
+        watcher = asyncio.ensure_future(self.watch(poll_interval)) if watch else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Resident query server for one challenge 1b collection.")
+    parser.add_argument("--collection", default=os.getenv('INPUT_DIR', '/app/input'),
+                        help="folder with challenge1b_input.json and a PDFs subfolder")
+    parser.add_argument("--workers", type=int, default=QUERY_WORKERS,
+                        help="query worker processes; 0 uses every available core")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--unix-socket", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--no-watch", action="store_true",
+                        help="only reload on POST /reload instead of polling the collection")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        settings = analyst.settings_from_env()
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        exit(1)
+
+    collection = WarmCollection(args.collection, settings['store'], settings['workers'],
+                                settings['document_dir'], settings['dedup'])
+    server = QueryServer(collection, args.workers or (os.cpu_count() or 1), settings['scoring'], settings['top_k'])
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix_socket, args.poll_interval, not args.no_watch))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        exit(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
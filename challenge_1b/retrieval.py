@@ -0,0 +1,189 @@
+import math
+import heapq
+from collections import Counter
+
+import numpy as np
+
+# SciPy (pinned in requirements.txt) does the sparse matrix product. Without
+# it score_matrix adds each query term's postings into the score columns
+# directly, which gives the same scores without a dense block-by-term matrix.
+try:
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+# --- BM25 parameters ---
+# Term frequency saturation
+BM25_K1 = 1.2
+# Strength of block length normalization (0 = none, 1 = full)
+BM25_B = 0.75
+
+class BM25Index:
+    """
+    Inverted index over tokenized text blocks, scored with Okapi BM25.
+
+    Each term maps to a postings list of block ids (in insertion order) and
+    the term's frequency in each block. Queries are scored against every
+    block at once by score_matrix, which only reads the postings of the
+    query terms.
+    """
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings = {} # term -> ([block ids], [term frequencies])
+        self.block_lengths = []
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.block_lengths)
+
+    def add(self, tokens):
+        """
+        Adds one block's tokens to the index and returns its block id.
+        """
+        block_id = len(self.block_lengths)
+        for term, tf in Counter(tokens).items():
+            block_ids, tfs = self.postings.setdefault(term, ([], []))
+            block_ids.append(block_id)
+            tfs.append(tf)
+        self.block_lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        return block_id
+
+    def document_frequency(self, term):
+        postings = self.postings.get(term)
+        return len(postings[0]) if postings else 0
+
+    def idf(self, term):
+        df = self.document_frequency(term)
+        n = len(self.block_lengths)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _term_score(self, idf, tf, length):
+        avg_length = self.total_length / len(self.block_lengths) if self.block_lengths else 0.0
+        norm = self.k1 * (1 - self.b + self.b * length / avg_length) if avg_length else self.k1
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def score_tokens(self, tokens, query_tokens):
+        """
+        Scores a text that is not in the index (e.g. a paragraph of an
+        indexed block) against the query using the index's statistics.
+        """
+        if not tokens:
+            return 0.0
+        counts = Counter(tokens)
+        score = 0.0
+        for term in set(query_tokens):
+            tf = counts.get(term)
+            if tf and term in self.postings:
+                score += self._term_score(self.idf(term), tf, len(tokens))
+        return score
+
+class TopK:
+    """
+    Keeps the k highest-scoring items pushed into it in a bounded min-heap,
+    so memory stays O(k) however many items are pushed. Ties go to the item
+    pushed first, as with a stable sort. With k=None every item is kept.
+    """
+    def __init__(self, k=None):
+        self.k = k
+        self.heap = [] # (score, -sequence, item)
+        self.pushed = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, score, item):
+        entry = (score, -self.pushed, item)
+        self.pushed += 1
+        if self.k is None or len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+
+    def ranked(self):
+        """
+        Kept items, best first.
+        """
+        return [item for _, _, item in sorted(self.heap, key=lambda e: (-e[0], -e[1]))]
+
+    def in_push_order(self):
+        """
+        Kept items, in the order they were pushed.
+        """
+        return [item for _, _, item in sorted(self.heap, key=lambda e: -e[1])]
+
+def score_matrix(index, query_token_lists, method='bm25'):
+    """
+    Scores every indexed block against every query in one pass and returns
+    a (blocks x queries) float array.
+
+    The postings of all query terms are laid out as a sparse block-by-term
+    matrix (term frequencies for 'overlap', BM25 term weights for 'bm25')
+    and multiplied by a binary term-by-query matrix, so each posting is
+    visited once no matter how many queries share the term. 'overlap'
+    scores are then divided by block length, matching
+    calculate_relevance_score in document_analyst.
+    """
+    n_blocks = len(index)
+    vocabulary = {}
+    for query_tokens in query_token_lists:
+        for term in query_tokens:
+            if term in index.postings and term not in vocabulary:
+                vocabulary[term] = len(vocabulary)
+
+    rows, cols, values = [], [], []
+    offsets = [0] # start of each vocabulary term's postings in rows/cols/values
+    for term, column in vocabulary.items():
+        block_ids, tfs = index.postings[term]
+        rows.append(np.asarray(block_ids, dtype=np.int64))
+        cols.append(np.full(len(block_ids), column, dtype=np.int64))
+        values.append(np.asarray(tfs, dtype=np.float64))
+        offsets.append(offsets[-1] + len(block_ids))
+
+    query_rows, query_cols = [], []
+    for query_index, query_tokens in enumerate(query_token_lists):
+        for term in set(query_tokens):
+            if term in vocabulary:
+                query_rows.append(vocabulary[term])
+                query_cols.append(query_index)
+
+    lengths = np.asarray(index.block_lengths, dtype=np.float64)
+    if not vocabulary:
+        scores = np.zeros((n_blocks, len(query_token_lists)))
+    else:
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        values = np.concatenate(values)
+        if method == 'bm25':
+            avg_length = index.total_length / n_blocks
+            if avg_length:
+                norms = index.k1 * (1 - index.b + index.b * lengths[rows] / avg_length)
+            else:
+                norms = np.full(len(rows), index.k1)
+            idfs = np.array([index.idf(term) for term in vocabulary])
+            values = idfs[cols] * values * (index.k1 + 1) / (values + norms)
+
+        if SCIPY_AVAILABLE:
+            shape = (n_blocks, len(vocabulary))
+            query_shape = (len(vocabulary), len(query_token_lists))
+            ones = np.ones(len(query_rows))
+            blocks = sparse.csr_matrix((values, (rows, cols)), shape=shape)
+            queries = sparse.csc_matrix((ones, (query_rows, query_cols)), shape=query_shape)
+            scores = (blocks @ queries).toarray()
+        else:
+            # The same product, one (term, query) pair at a time. A term's
+            # postings list each block once, so a fancy-indexed += is exact.
+            scores = np.zeros((n_blocks, len(query_token_lists)))
+            for column, query_index in zip(query_rows, query_cols):
+                start, stop = offsets[column], offsets[column + 1]
+                scores[rows[start:stop], query_index] += values[start:stop]
+
+    if method == 'overlap':
+        scores = scores / (lengths + 1e-6)[:, None]
+        # Empty queries score 0 everywhere, as in calculate_relevance_score
+        for query_index, query_tokens in enumerate(query_token_lists):
+            if not query_tokens:
+                scores[:, query_index] = 0.0
+    return scores
@@ -0,0 +1,136 @@
+import os
+import sys
+import glob
+import time
+import tempfile
+
+import document_analyst as analyst
+import pipeline_metrics
+from block_store import BlockStore, file_digest
+
+# Runs every collection under a root folder in one warm process, instead of
+# one document_analyst.py process (and tokenizer/langdetect start-up) per
+# collection.
+#
+# 1. Every challenge1b_input.json matching COLLECTION_PATTERN under
+#    COLLECTIONS_ROOT is read.
+# 2. Each distinct PDF (by content, so a PDF copied into several collections
+#    counts once) is extracted and tokenized a single time, in a worker pool
+#    when PREPARE_WORKERS > 1, into a block store shared by all collections:
+#    the BLOCK_STORE_PATH store when one is configured, a temporary SQLite
+#    file otherwise. Documents stream through iter_prepared_documents, so
+#    only the few being prepared are held in memory, never every PDF's
+#    sections.
+# 3. Each collection is then ranked from the store and its
+#    challenge1b_output.json written into the collection folder.
+#
+# The other settings are the environment variables of document_analyst.py.
+# A failing collection is reported and the run continues; the exit status
+# is 1 if any collection failed.
+
+# Glob, relative to the root, matching the input file of each collection
+COLLECTION_PATTERN = "Collection */challenge1b_input.json"
+
+def find_collections(root, pattern=COLLECTION_PATTERN):
+    """
+    Collection folders under root whose input file matches pattern, sorted.
+    """
+    return sorted(os.path.dirname(path) for path in glob.glob(os.path.join(root, pattern)))
+
+def prepare_shared(pdf_paths, store, workers, document_dir=None):
+    """
+    Prepares each distinct PDF among pdf_paths once and leaves its sections
+    in store. Returns (distinct PDFs, PDFs shared by several collections).
+    """
+    distinct = {}
+    for pdf_path in pdf_paths:
+        distinct.setdefault(file_digest(pdf_path), []).append(pdf_path)
+    shared = sum(1 for paths in distinct.values() if len(paths) > 1)
+
+    unique_paths = [paths[0] for paths in distinct.values()]
+    # Failed documents are not stored; their collections parse them again
+    # and report the failure in their own metadata.
+    for _ in analyst.iter_prepared_documents(unique_paths, store, workers, document_dir):
+        pass
+    return len(distinct), shared
+
+def print_summary(results, prepare_seconds, distinct, shared):
+    print(f"\nPrepared {distinct} distinct PDF(s) ({shared} shared between collections) in {prepare_seconds:.1f}s.")
+    width = max([len(r['collection']) for r in results] + [10])
+    print(f"{'collection':<{width}}  {'documents':>9}  {'seconds':>8}  status")
+    for r in results:
+        print(f"{r['collection']:<{width}}  {r['documents']:>9}  {r['seconds']:>8.2f}  {r['status']}")
+    total = prepare_seconds + sum(r['seconds'] for r in results)
+    failed = sum(1 for r in results if r['status'] != 'ok')
+    print(f"{len(results)} collection(s), {failed} failed, {total:.1f}s in total.")
+
+if __name__ == "__main__":
+    root = os.getenv('COLLECTIONS_ROOT', '/app/input')
+    pattern = os.getenv('COLLECTION_PATTERN', COLLECTION_PATTERN)
+
+    collection_dirs = find_collections(root, pattern)
+    if not collection_dirs:
+        print(f"Error: no collections matching '{pattern}' found in '{root}'.", file=sys.stderr)
+        exit(1)
+
+    if os.getenv('PIPELINE_METRICS'):
+        pipeline_metrics.enable()
+    try:
+        settings = analyst.settings_from_env()
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        exit(1)
+    temporary_store = None
+    if settings['store'] is None:
+        # On disk, so the prepared sections of every distinct PDF are not
+        # kept in memory for the whole run
+        temporary_store = tempfile.TemporaryDirectory(prefix="block_store_")
+        settings['store'] = BlockStore(os.path.join(temporary_store.name, "blocks.sqlite"),
+                                       analyst.segmentation_config(document_models=bool(settings['document_dir'])))
+
+    results = []
+    collections = []
+    for collection_dir in collection_dirs:
+        name = os.path.relpath(collection_dir, root)
+        try:
+            persona, job, pdf_paths = analyst.load_collection(collection_dir)
+        except (OSError, ValueError) as e:
+            print(f"Error reading collection '{name}': {e}", file=sys.stderr)
+            results.append({"collection": name, "documents": 0, "seconds": 0.0, "status": "failed"})
+            continue
+        if not pdf_paths:
+            print(f"No valid PDF files found in '{name}'. It will be skipped.", file=sys.stderr)
+            results.append({"collection": name, "documents": 0, "seconds": 0.0, "status": "skipped"})
+            continue
+        collections.append((name, collection_dir, persona, job, pdf_paths))
+
+    print(f"Found {len(collection_dirs)} collection(s) in '{root}'.")
+    start = time.perf_counter()
+    distinct, shared = prepare_shared([p for *_, pdf_paths in collections for p in pdf_paths],
+                                      settings['store'], settings['workers'], settings['document_dir'])
+    prepare_seconds = time.perf_counter() - start
+
+    for name, collection_dir, persona, job, pdf_paths in collections:
+        start = time.perf_counter()
+        try:
+            output_file_path = analyst.write_collection_output(pdf_paths, persona, job, collection_dir, **settings)
+            status = "ok"
+            print(f"{name}: output saved to '{output_file_path}'.")
+        except Exception as e:
+            print(f"Error processing collection '{name}': {e}", file=sys.stderr)
+            status = "failed"
+        results.append({"collection": name, "documents": len(pdf_paths),
+                        "seconds": time.perf_counter() - start, "status": status})
+
+    if temporary_store is not None:
+        settings['store'].close()
+        temporary_store.cleanup()
+
+    results.sort(key=lambda r: r['collection'])
+    print_summary(results, prepare_seconds, distinct, shared)
+    if pipeline_metrics.METRICS is not None:
+        metrics_path = os.path.join(root, "pipeline_metrics.json")
+        pipeline_metrics.write(metrics_path)
+        print(f"Stage metrics saved to '{metrics_path}'.")
+    if any(r['status'] == 'failed' for r in results):
+        exit(1)